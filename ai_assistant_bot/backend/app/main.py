@@ -1,15 +1,20 @@
 from __future__ import annotations
-from supabase import create_client
 import asyncio
-import json
+import base64
+import functools
+import hashlib
+import heapq
+import itertools
 import os
 import subprocess
 import sys
 import time
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
+from urllib.parse import quote
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -21,9 +26,15 @@ if __name__ == "__main__" and (__package__ is None or __package__ == ""):
     __package__ = "app"
 
 from fastapi import FastAPI, Header, HTTPException, Query, Request
+try:
+    from ciso8601 import parse_datetime as _ciso_parse_datetime  # type: ignore
+except Exception:
+    _ciso_parse_datetime = None  # type: ignore
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.responses import PlainTextResponse, StreamingResponse, JSONResponse
+from fastapi.responses import ORJSONResponse
+from starlette.responses import StreamingResponse
 import httpx
+import orjson
 
 from .models import (
     BotsStatusRequest,
@@ -36,12 +47,14 @@ from .models import (
     RAGIngestGmailRequest,
     WebhookSubscribeRequest,
 )
-from .services.state import APP_STATE
-from .supabase_integration import upsert_meeting as _sb_upsert
+from .services.state import APP_STATE, KEYWORD_TRIGGER_TYPES
+from .supabase_integration import queue_upsert_meeting as _sb_queue_upsert
+from .supabase_integration import run_write_flusher as _sb_write_flusher
 from .supabase_integration import fetch_meetings as _sb_fetch
 from .supabase_integration import health as _sb_health
-from .supabase_integration import fetch_meetings as _sb_fetch
-from .rag_pipeline import ingest_summary_units_for_bot, answer_question_with_rag
+from .supabase_integration import get_client as _sb_client
+from .supabase_integration import fetch_meetings_cached as _sb_fetch_cached
+from .supabase_integration import aclose as _sb_aclose
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
@@ -49,7 +62,7 @@ SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
     raise RuntimeError("Supabase environment variables not set")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+
 def _load_env_files() -> None:
     """Best-effort .env loader.
 
@@ -97,12 +110,79 @@ BOT_VENV_PY = Path(__file__).resolve().parents[2] / ".venv" / "Scripts" / "pytho
 DATA_DIR = Path(__file__).resolve().parents[1] / "data"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
+
+class BotRuntime:
+    """Per-bot process/task handles so we can stop them (one record per bot_id)."""
+
+    __slots__ = ("proc", "start_task", "cancel_event", "pm_generation")
+
+    def __init__(self) -> None:
+        # asyncio Process normally; subprocess.Popen when the loop cannot spawn children.
+        self.proc: Optional[Union[asyncio.subprocess.Process, subprocess.Popen]] = None
+        self.start_task: Optional[asyncio.Task] = None
+        # Set to abort a pending scheduled start.
+        self.cancel_event: Optional[asyncio.Event] = None
+        # Generation of this bot's entries in _DUE_HEAP; older entries are stale.
+        self.pm_generation = 0
+
+
 # Track running bot processes and scheduled start tasks so we can stop them.
-BOT_PROCESSES: Dict[str, subprocess.Popen] = {}
-BOT_START_TASKS: Dict[str, asyncio.Task] = {}
-BOT_PLANNED_MESSAGE_TASKS: Dict[str, List[asyncio.Task]] = {}
+BOT_RT: Dict[str, BotRuntime] = {}
+
+
+def _bot_rt(bot_id: str) -> BotRuntime:
+    rt = BOT_RT.get(bot_id)
+    if rt is None:
+        rt = BOT_RT[bot_id] = BotRuntime()
+    return rt
+
+
+# Planned-message trigger types (keyword triggers: KEYWORD_TRIGGER_TYPES in services.state).
+_TIME_TRIGGER_TYPES = frozenset({"scheduled", "scheduled_at", "time"})
+_OFFSET_TRIGGER_TYPES = frozenset({"offset", "offset_minutes", "start_offset"})
+# States a bot process may report via /bots/{bot_id}/state.
+_BOT_STATES = frozenset({"scheduled", "joining", "running", "ended", "error"})
+
+# Time-triggered planned messages are kept in one min-heap drained by a single
+# scheduler task. Entries: (due_epoch, seq, bot_id, generation, pm_id, text, event_id, meet_link).
+# Rescheduling/stopping a bot bumps its BotRuntime.pm_generation so stale entries are skipped.
+_DUE_HEAP: List[tuple] = []
+_DUE_SEQ = itertools.count()
+_SCHEDULER_WAKE = asyncio.Event()
+
+# SSE writes: frames arriving within this window are sent in one chunk.
+_SSE_COALESCE_SEC = max(0.0, float(os.getenv("SSE_COALESCE_MS", "50") or 0) / 1000.0)
+_SSE_COALESCE_MAX = 64
+# Constant SSE frames, encoded once.
+_SSE_HELLO = b": connected\n\n"
+_SSE_PING = b"event: ping\ndata: {}\n\n"
+
+# Short-lived cache of Google calendar IDs keyed by a hash of the provider token.
+_CAL_CACHE: Dict[str, tuple[float, List[str]]] = {}
+_CAL_CACHE_TTL_SEC = 300.0
+_CAL_CACHE_MAX = 1000
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    # One pooled client for outbound Google API calls (keep-alive across requests).
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=10.0,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+    )
+    scheduler = asyncio.create_task(_planned_message_scheduler())
+    sb_writer = asyncio.create_task(_sb_write_flusher())
+    try:
+        yield
+    finally:
+        scheduler.cancel()
+        sb_writer.cancel()
+        await app.state.http.aclose()
+        await APP_STATE.aclose()
+        await _sb_aclose()
 
-app = FastAPI(title="Meet Caption Bot Backend")
+
+app = FastAPI(title="Meet Caption Bot Backend", lifespan=_lifespan, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -118,31 +198,40 @@ def _ok_auth(_: Optional[str]) -> None:
     # Later you can add real verification here.
     return
 
-def _extract_user_id_from_jwt(auth_header: Optional[str]) -> Optional[str]:
-    """Best-effort decode of a Supabase JWT to extract user id (sub).
-
-    Accepts "Bearer <jwt>"; returns the 'sub' claim if present.
-    """
+def _decode_jwt_sub(token: str) -> Optional[str]:
+    """Decode the JWT payload segment and return its 'sub' (or 'user_id') claim."""
     try:
-        if not auth_header:
-            return None
-        parts = auth_header.split()
-        token = parts[-1] if parts else auth_header
         segs = token.split(".")
         if len(segs) < 2:
             return None
-        import base64, json as _json
-        def b64url_decode(s: str) -> bytes:
-            pad = "=" * ((4 - len(s) % 4) % 4)
-            return base64.urlsafe_b64decode(s + pad)
-        payload_raw = b64url_decode(segs[1])
-        data = _json.loads(payload_raw.decode("utf-8", errors="ignore"))
+        seg = segs[1]
+        pad = "=" * ((4 - len(seg) % 4) % 4)
+        payload_raw = base64.urlsafe_b64decode(seg + pad)
+        data = orjson.loads(payload_raw)
         sub = str(data.get("sub") or data.get("user_id") or "").strip()
         return sub or None
     except Exception:
         return None
 
 
+@functools.lru_cache(maxsize=2048)
+def _uid_from_header(auth_header: str) -> Optional[str]:
+    parts = auth_header.split()
+    token = parts[-1] if parts else auth_header
+    return _decode_jwt_sub(token)
+
+
+def _extract_user_id_from_jwt(auth_header: Optional[str]) -> Optional[str]:
+    """Best-effort decode of a Supabase JWT to extract user id (sub).
+
+    Accepts "Bearer <jwt>"; returns the 'sub' claim if present. Results are
+    memoized per raw header value since the UI re-sends the same token on every poll.
+    """
+    if not auth_header:
+        return None
+    return _uid_from_header(auth_header)
+
+
 @app.get("/")
 async def root():
     return {"ok": True, "service": "bot-backend", "time": time.time()}
@@ -167,25 +256,70 @@ async def debug_meetings(user_id: Optional[str] = Query(default=None), meet_link
     return {"user_id": uid, "meet_link": ml, **res}
 
 
+# Transcript lines joined per body write in GET /bots/{bot_id}/transcript.
+_TRANSCRIPT_CHUNK_LINES = 500
+
+
+def _read_lines(f: Any, n: int) -> List[bytes]:
+    return list(itertools.islice(f, n))
+
+
 @app.get("/bots/{bot_id}/transcript")
 async def get_bot_transcript(bot_id: str, format: str = Query("text")):
     """Return transcript for a bot.
 
     - format=text: returns plain concatenated text
     - format=json: returns raw items array
+
+    Both shapes are streamed instead of being built in memory as one body.
     """
     s = await APP_STATE.get_bot(bot_id)
     if not s:
         raise HTTPException(status_code=404, detail={"error": "bot not found"})
-    items = list(s.utterances)
+    head = b'{"bot_id":' + orjson.dumps(bot_id)
+
     if (format or "").lower() == "json":
-        return {"bot_id": bot_id, "items": items}
-    # Build transcript text via helper
-    try:
-        text = APP_STATE._build_transcript_text(items)  # type: ignore[attr-defined]
-    except Exception:
-        text = "".join([(it or {}).get("text") or "" for it in items])
-    return {"bot_id": bot_id, "text": text}
+        # Snapshot what exists now: captions keep arriving while streaming, and a
+        # deque cannot be iterated across appends. Utterances evicted from memory
+        # are read back from the spill file first (no await between the two).
+        spill_path, spilled = APP_STATE.utterance_spill(s)
+        recent = tuple(s.utterances)
+
+        async def _json_body():
+            yield head + b',"items":['
+            sep = b""
+            if spill_path is not None:
+                f = await asyncio.to_thread(spill_path.open, "rb")
+                try:
+                    left = spilled
+                    while left > 0:
+                        lines = await asyncio.to_thread(_read_lines, f, min(left, _TRANSCRIPT_CHUNK_LINES))
+                        if not lines:
+                            break
+                        left -= len(lines)
+                        yield sep + b",".join(line.rstrip(b"\n") for line in lines)
+                        sep = b","
+                finally:
+                    f.close()
+            for it in recent:
+                yield sep + orjson.dumps(it)
+                sep = b","
+            yield b"]}"
+
+        return StreamingResponse(_json_body(), media_type="application/json")
+
+    async def _text_body():
+        yield head + b',"text":"'
+        # Lines were formatted once when each utterance arrived. Join them a chunk
+        # at a time so a long meeting is a few body writes, not one per line.
+        n = len(s.transcript_lines)
+        for i in range(0, n, _TRANSCRIPT_CHUNK_LINES):
+            chunk = "\n".join(s.transcript_lines[i:min(i + _TRANSCRIPT_CHUNK_LINES, n)])
+            # orjson-encode the chunk as a JSON string and drop the surrounding quotes.
+            yield (b"\\n" if i else b"") + orjson.dumps(chunk)[1:-1]
+        yield b'"}'
+
+    return StreamingResponse(_text_body(), media_type="application/json")
 
 
 @app.post("/bots/summarize")
@@ -224,6 +358,7 @@ async def get_bot_summary(bot_id: str):
 
 @app.get("/events")
 async def events(
+    request: Request,
     links_only: bool = Query(default=True),
     calendar_ids: Optional[List[str]] = Query(default=None),
     time_min: Optional[str] = Query(default=None),
@@ -244,16 +379,23 @@ async def events(
         # No provider token; nothing to fetch.
         return {"events": [], "deleted_ids": [], "links": []}
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        # Resolve calendar IDs if not provided
-        cals: List[str] = []
-        if calendar_ids:
-            cals = [c for c in calendar_ids if (c or "").strip()]
+    client: httpx.AsyncClient = request.app.state.http
+    headers = {"Authorization": f"Bearer {token}"}
+
+    # Resolve calendar IDs if not provided
+    cals: List[str] = []
+    if calendar_ids:
+        cals = [c for c in calendar_ids if (c or "").strip()]
+    else:
+        cache_key = hashlib.blake2b(token.encode("utf-8"), digest_size=16).hexdigest()
+        entry = _CAL_CACHE.get(cache_key)
+        if entry and time.time() - entry[0] < _CAL_CACHE_TTL_SEC:
+            cals = list(entry[1])
         else:
             try:
                 r = await client.get(
                     "https://www.googleapis.com/calendar/v3/users/me/calendarList",
-                    headers={"Authorization": f"Bearer {token}"},
+                    headers=headers,
                 )
                 if r.status_code == 200:
                     data = r.json() or {}
@@ -261,65 +403,79 @@ async def events(
                         cid = (item.get("id") or "").strip()
                         if cid:
                             cals.append(cid)
+                    # Evict the oldest entry (insertion order) once the cap is hit.
+                    _CAL_CACHE.pop(cache_key, None)
+                    if len(_CAL_CACHE) >= _CAL_CACHE_MAX:
+                        _CAL_CACHE.pop(next(iter(_CAL_CACHE)), None)
+                    _CAL_CACHE[cache_key] = (time.time(), list(cals))
             except Exception:
                 pass
 
-        events: List[Dict[str, Any]] = []
-        deleted_ids: List[str] = []
-        unique_links: Dict[str, bool] = {}
-
-        for cid in cals:
-            params = {
-                "singleEvents": "true",
-                "orderBy": "startTime",
-                "showDeleted": "true",
-            }
-            if time_min:
-                params["timeMin"] = time_min
-            if time_max:
-                params["timeMax"] = time_max
-            try:
-                r = await client.get(
-                    f"https://www.googleapis.com/calendar/v3/calendars/{httpx.utils.escape_xml(str(cid))}/events",
-                    headers={"Authorization": f"Bearer {token}"},
-                    params=params,
-                )
-                if r.status_code != 200:
-                    continue
-                data = r.json() or {}
-                for ev in (data.get("items") or []):
-                    status = (ev.get("status") or "").strip().lower()
-                    if status == "cancelled":
-                        eid = (ev.get("id") or "").strip()
-                        if eid:
-                            deleted_ids.append(eid)
-                        continue
-                    # Extract Meet link
-                    meet_link = (ev.get("hangoutLink") or "").strip()
-                    if not meet_link:
-                        try:
-                            conf = ev.get("conferenceData") or {}
-                            for ep in (conf.get("entryPoints") or []):
-                                if (ep.get("entryPointType") or "").lower() == "video":
-                                    meet_link = (ep.get("uri") or "").strip()
-                                    if meet_link:
-                                        break
-                        except Exception:
-                            pass
-                    if meet_link:
-                        unique_links[meet_link] = True
-                    events.append({
-                        "id": ev.get("id"),
-                        "summary": ev.get("summary"),
-                        "start": (ev.get("start") or {}).get("dateTime") or (ev.get("start") or {}).get("date"),
-                        "end": (ev.get("end") or {}).get("dateTime") or (ev.get("end") or {}).get("date"),
-                        "updated": ev.get("updated"),
-                        "status": status,
-                        "meet_link": meet_link,
-                        "calendar_id": cid,
-                    })
-            except Exception:
+    params = {
+        "singleEvents": "true",
+        "orderBy": "startTime",
+        "showDeleted": "true",
+    }
+    if time_min:
+        params["timeMin"] = time_min
+    if time_max:
+        params["timeMax"] = time_max
+
+    # Fan out one GET per calendar over the shared pool.
+    results = await asyncio.gather(
+        *[
+            client.get(
+                f"https://www.googleapis.com/calendar/v3/calendars/{quote(str(cid), safe='')}/events",
+                headers=headers,
+                params=params,
+            )
+            for cid in cals
+        ],
+        return_exceptions=True,
+    )
+
+    events: List[Dict[str, Any]] = []
+    deleted_ids: List[str] = []
+    unique_links: Dict[str, bool] = {}
+
+    for cid, r in zip(cals, results):
+        try:
+            if isinstance(r, BaseException) or r.status_code != 200:
                 continue
+            data = r.json() or {}
+            for ev in (data.get("items") or []):
+                status = (ev.get("status") or "").strip().lower()
+                if status == "cancelled":
+                    eid = (ev.get("id") or "").strip()
+                    if eid:
+                        deleted_ids.append(eid)
+                    continue
+                # Extract Meet link
+                meet_link = (ev.get("hangoutLink") or "").strip()
+                if not meet_link:
+                    try:
+                        conf = ev.get("conferenceData") or {}
+                        for ep in (conf.get("entryPoints") or []):
+                            if (ep.get("entryPointType") or "").lower() == "video":
+                                meet_link = (ep.get("uri") or "").strip()
+                                if meet_link:
+                                    break
+                    except Exception:
+                        pass
+                if meet_link:
+                    unique_links[meet_link] = True
+                events.append({
+                    "id": ev.get("id"),
+                    "summary": ev.get("summary"),
+                    "start": (ev.get("start") or {}).get("dateTime") or (ev.get("start") or {}).get("date"),
+                    "end": (ev.get("end") or {}).get("dateTime") or (ev.get("end") or {}).get("date"),
+                    "updated": ev.get("updated"),
+                    "status": status,
+                    "meet_link": meet_link,
+                    "calendar_id": cid,
+                })
+        except Exception:
+            continue
 
     links = list(unique_links.keys())
     if links_only:
@@ -364,21 +520,16 @@ async def schedule_bot(req: ScheduleBotRequest, authorization: Optional[str] = H
         user_id=user_id or "",
     )
 
-    # Record meeting in Supabase (best-effort)
-    try:
-        ok = _sb_upsert(
-            user_id=session.user_id,
-            event_id=session.event_id,
-            title=session.title,
-            start_time_iso=session.start_time,
-            meet_link=session.meet_link,
-            attendee_bot_id=session.bot_id,
-            summary="",
-        )
-        if not ok:
-            print(f"[bot-backend] supabase upsert failed for bot_id={session.bot_id}")
-    except Exception as e:
-        print(f"[bot-backend] supabase upsert error: {e}")
+    # Record meeting in Supabase (best-effort, batched by the supabase write flusher)
+    _sb_queue_upsert(
+        user_id=session.user_id,
+        event_id=session.event_id,
+        title=session.title,
+        start_time_iso=session.start_time,
+        meet_link=session.meet_link,
+        attendee_bot_id=session.bot_id,
+        summary="",
+    )
 
     # Fire-and-forget: start the Playwright bot.
     # If a start_time is provided, wait until then; otherwise start immediately.
@@ -391,7 +542,7 @@ async def schedule_bot(req: ScheduleBotRequest, authorization: Optional[str] = H
             chat_on_join=(req.chat_on_join or "").strip(),
         )
     )
-    BOT_START_TASKS[session.bot_id] = task
+    _bot_rt(session.bot_id).start_task = task
 
     # Best-effort planned message scheduling (chat messages like Attendee).
     asyncio.create_task(
@@ -469,7 +620,13 @@ async def webhook_list(bot_id: Optional[str] = Query(default=None), meet_link: O
     return {"bot_id": b, "subscriptions": sanitized}
 
 
+# Local timezone used for naive timestamps, resolved once at import.
+_LOCAL_TZ = datetime.now().astimezone().tzinfo or timezone.utc
+
+
+@functools.lru_cache(maxsize=4096)
 def _parse_iso_datetime(s: str) -> Optional[datetime]:
+    # Memoized: planned messages of one meeting usually share the same start_time.
     if not s:
         return None
     s = s.strip()
@@ -487,8 +644,7 @@ def _parse_iso_datetime(s: str) -> Optional[datetime]:
 
     # If no timezone info, assume LOCAL timezone (frontend/Google calendar often uses local time).
     if dt.tzinfo is None:
-        local_tz = datetime.now().astimezone().tzinfo or timezone.utc
-        dt = dt.replace(tzinfo=local_tz)
+        dt = dt.replace(tzinfo=_LOCAL_TZ)
     return dt
 
 
@@ -510,9 +666,16 @@ def _pm_matches_session(pm: Dict[str, Any], *, event_id: str, meet_link: str) ->
     return True
 
 
-def _pm_mark_posted(pm: Dict[str, Any], *, bot_id: str, source: str, extra: Optional[Dict[str, Any]] = None) -> None:
+def _pm_mark_posted(
+    pm: Dict[str, Any],
+    *,
+    bot_id: str,
+    source: str,
+    posted_at: Optional[str] = None,
+    extra: Optional[Dict[str, Any]] = None,
+) -> None:
     pm["status"] = "posted"
-    pm["posted_at"] = datetime.now(timezone.utc).isoformat()
+    pm["posted_at"] = posted_at or datetime.now(timezone.utc).isoformat()
     pm["posted_bot_id"] = bot_id
     pm["posted_source"] = source
     if extra:
@@ -523,6 +686,9 @@ def _pm_mark_posted(pm: Dict[str, Any], *, bot_id: str, source: str, extra: Opti
 
 
 async def _maybe_trigger_keyword_planned_messages(bot_id: str, *, meet_link: str, text: str) -> None:
+    # Common case: no keyword cues configured, so skip the lookup and lowercasing.
+    if not APP_STATE.has_keyword_triggers:
+        return
     s = await APP_STATE.get_bot(bot_id)
     if not s or s.state == "ended":
         return
@@ -532,66 +698,98 @@ async def _maybe_trigger_keyword_planned_messages(bot_id: str, *, meet_link: str
     if not msg_text:
         return
 
-    for pm_id, pm in list(APP_STATE.planned_messages.items()):
+    hits = APP_STATE.match_keyword_planned_messages(msg_text, event_id=event_id, meet_link=meet_link)
+    if not hits:
+        return
+    # One timestamp for every message posted off this caption.
+    posted_at = datetime.now(timezone.utc).isoformat()
+    for pm_id, matched in hits:
         try:
+            pm = APP_STATE.planned_messages.get(pm_id)
             if not isinstance(pm, dict):
                 continue
-            if not _pm_matches_session(pm, event_id=event_id, meet_link=meet_link):
-                continue
-
-            trigger_type = (pm.get("trigger_type") or "").strip().lower()
-            if trigger_type not in {"keyword", "keywords", "keyword_cues"}:
-                continue
 
             # Only post once per planned message for now.
             if (pm.get("status") or "").strip().lower() == "posted":
                 continue
 
-            keywords = pm.get("keywords") or []
-            if not isinstance(keywords, list) or not keywords:
-                continue
-
-            matched = None
-            for kw in keywords:
-                k = (kw or "").strip().lower()
-                if k and k in msg_text:
-                    matched = k
-                    break
-
-            if not matched:
-                continue
-
             say = (pm.get("text") or "").strip()
             if not say:
                 continue
 
             ok = await _enqueue_chat(bot_id, say, source="planned_keyword")
             if ok:
-                _pm_mark_posted(pm, bot_id=bot_id, source="planned_keyword", extra={"matched_keyword": matched})
-                APP_STATE.planned_messages[pm_id] = pm
+                _pm_mark_posted(pm, bot_id=bot_id, source="planned_keyword", posted_at=posted_at, extra={"matched_keyword": matched})
         except Exception:
             continue
 
 
-async def _schedule_planned_messages_for_bot(bot_id: str, *, event_id: str, meet_link: str, start_time_iso: str) -> None:
-    # Cancel existing tasks for this bot.
-    for t in BOT_PLANNED_MESSAGE_TASKS.pop(bot_id, []):
+def _has_pending_planned_messages(bot_id: str, gen: int) -> bool:
+    return any(e[2] == bot_id and e[3] == gen for e in _DUE_HEAP)
+
+
+async def _post_planned_message(
+    bot_id: str,
+    planned_id: str,
+    message_text: str,
+    *,
+    event_id: str,
+    meet_link: str,
+    posted_at: Optional[str] = None,
+) -> None:
+    s = await APP_STATE.get_bot(bot_id)
+    if not s or s.state == "ended":
+        return
+    pm_current = APP_STATE.planned_messages.get(planned_id)
+    if not isinstance(pm_current, dict):
+        return
+    # If deleted or already posted, don't enqueue.
+    if (pm_current.get("status") or "").strip().lower() == "posted":
+        return
+    if not _pm_matches_session(pm_current, event_id=event_id, meet_link=meet_link):
+        return
+    ok = await _enqueue_chat(bot_id, message_text, source="planned")
+    if ok:
+        _pm_mark_posted(pm_current, bot_id=bot_id, source="planned", posted_at=posted_at)
+
+
+async def _planned_message_scheduler() -> None:
+    """Single background loop that posts planned messages as they come due."""
+    while True:
+        _SCHEDULER_WAKE.clear()
+        now = time.time()
+        posted_at = datetime.fromtimestamp(now, timezone.utc).isoformat()
+        while _DUE_HEAP and _DUE_HEAP[0][0] <= now:
+            _, _, bot_id, gen, pm_id, text, event_id, meet_link = heapq.heappop(_DUE_HEAP)
+            rt = BOT_RT.get(bot_id)
+            if rt is None or rt.pm_generation != gen:
+                continue
+            try:
+                await _post_planned_message(bot_id, pm_id, text, event_id=event_id, meet_link=meet_link, posted_at=posted_at)
+            except Exception:
+                pass
+        timeout = max(0.0, _DUE_HEAP[0][0] - time.time()) if _DUE_HEAP else None
         try:
-            t.cancel()
-        except Exception:
+            await asyncio.wait_for(_SCHEDULER_WAKE.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
             pass
 
+
+async def _schedule_planned_messages_for_bot(bot_id: str, *, event_id: str, meet_link: str, start_time_iso: str) -> None:
+    # Drop anything previously queued for this bot.
+    rt = _bot_rt(bot_id)
+    rt.pm_generation += 1
+    gen = rt.pm_generation
+
     start_dt = _parse_iso_datetime(start_time_iso) if start_time_iso else None
-    now_utc = datetime.now(timezone.utc)
-    tasks: List[asyncio.Task] = []
+    now_ts = time.time()
+    queued = False
 
-    planned_items = list(APP_STATE.planned_messages.items())
-    for pm_id, pm in planned_items:
+    for pm_id in APP_STATE.planned_ids_for_session(event_id, meet_link):
         try:
+            pm = APP_STATE.planned_messages.get(pm_id)
             if not isinstance(pm, dict):
                 continue
-            if not _pm_matches_session(pm, event_id=event_id, meet_link=meet_link):
-                continue
 
             trigger_type = (pm.get("trigger_type") or "").strip().lower()
             text = (pm.get("text") or "").strip()
@@ -599,7 +797,7 @@ async def _schedule_planned_messages_for_bot(bot_id: str, *, event_id: str, meet
                 continue
 
             # Keyword-cue triggers are handled on incoming captions.
-            if trigger_type in {"keyword", "keywords", "keyword_cues"}:
+            if trigger_type in KEYWORD_TRIGGER_TYPES:
                 continue
 
             if (pm.get("status") or "").strip().lower() == "posted":
@@ -608,46 +806,25 @@ async def _schedule_planned_messages_for_bot(bot_id: str, *, event_id: str, meet
             due: Optional[datetime] = None
 
             scheduled_at = (pm.get("scheduled_at") or "").strip()
-            if trigger_type in {"scheduled", "scheduled_at", "time"} and scheduled_at:
+            if trigger_type in _TIME_TRIGGER_TYPES and scheduled_at:
                 due = _parse_iso_datetime(scheduled_at)
 
             offset_minutes = pm.get("offset_minutes")
-            if due is None and trigger_type in {"offset", "offset_minutes", "start_offset"} and offset_minutes is not None:
+            if due is None and trigger_type in _OFFSET_TRIGGER_TYPES and offset_minutes is not None:
                 base = start_dt or datetime.now().astimezone()
                 due = base + timedelta(minutes=int(offset_minutes))
 
             if due is None:
                 continue
 
-            due_utc = due.astimezone(timezone.utc)
-            delay = (due_utc - now_utc).total_seconds()
-            if delay < 0:
-                delay = 0
-
-            async def _run_later(planned_id: str, message_text: str, seconds: float) -> None:
-                if seconds:
-                    await asyncio.sleep(seconds)
-                s = await APP_STATE.get_bot(bot_id)
-                if not s or s.state == "ended":
-                    return
-                pm_current = APP_STATE.planned_messages.get(planned_id)
-                if not isinstance(pm_current, dict):
-                    return
-                # If deleted or already posted, don't enqueue.
-                if (pm_current.get("status") or "").strip().lower() == "posted":
-                    return
-                if not _pm_matches_session(pm_current, event_id=event_id, meet_link=meet_link):
-                    return
-                ok = await _enqueue_chat(bot_id, message_text, source="planned")
-                if ok:
-                    _pm_mark_posted(pm_current, bot_id=bot_id, source="planned")
-                    APP_STATE.planned_messages[planned_id] = pm_current
-
-            tasks.append(asyncio.create_task(_run_later(pm_id, text, delay)))
+            due_ts = max(due.timestamp(), now_ts)
+            heapq.heappush(_DUE_HEAP, (due_ts, next(_DUE_SEQ), bot_id, gen, pm_id, text, event_id, meet_link))
+            queued = True
         except Exception:
             continue
 
-    BOT_PLANNED_MESSAGE_TASKS[bot_id] = tasks
+    if queued:
+        _SCHEDULER_WAKE.set()
 
 
 @app.post("/bots/{bot_id}/chat")
@@ -673,11 +850,8 @@ async def bot_next_command(bot_id: str, timeout: int = Query(default=25), author
     if q is None:
         return {"command": None}
 
-    try:
-        cmd = await asyncio.wait_for(q.get(), timeout=max(1, min(int(timeout), 60)))
-        return {"command": cmd}
-    except asyncio.TimeoutError:
-        return {"command": None}
+    cmd = await q.get(timeout=max(1, min(int(timeout), 60)))
+    return {"command": cmd}
 
 
 async def _start_bot_process_at_time(bot_id: str, meet_link: str, start_time_iso: str, chat_on_join: str = "") -> None:
@@ -698,15 +872,20 @@ async def _start_bot_process_at_time(bot_id: str, meet_link: str, start_time_iso
     # Mark as scheduled (already is by default) and sleep until time.
     await APP_STATE.set_state(bot_id, "scheduled")
     print(f"[bot-backend] bot_id={bot_id} will start in {int(delay)}s at {target.isoformat()}")
-    # Cap sleep chunks so cancellation/state changes can be added later.
-    remaining = delay
-    while remaining > 0:
-        await asyncio.sleep(min(remaining, 15))
-        remaining -= 15
-        s = await APP_STATE.get_bot(bot_id)
-        if not s or s.state == "ended":
-            return
+    # Sleep once; _stop_bot_process sets the event to abort early.
+    rt = _bot_rt(bot_id)
+    ev = rt.cancel_event = asyncio.Event()
+    try:
+        await asyncio.wait_for(ev.wait(), timeout=delay)
+        return
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        rt.cancel_event = None
 
+    s = await APP_STATE.get_bot(bot_id)
+    if not s or s.state == "ended":
+        return
     await _start_bot_process(bot_id, meet_link, chat_on_join=chat_on_join)
 
 
@@ -718,19 +897,25 @@ async def _stop_bot_process(bot_id: str) -> bool:
 
     stopped_any = False
 
-    task = BOT_START_TASKS.pop(bot_id, None)
+    # Dropping the runtime record also invalidates this bot's queued planned messages.
+    rt = BOT_RT.pop(bot_id, None)
+    if rt is None:
+        await APP_STATE.cleanup_bot(bot_id)
+        return stopped_any
+
+    if rt.cancel_event is not None:
+        rt.cancel_event.set()
+        stopped_any = True
+
+    task = rt.start_task
     if task is not None and not task.done():
         task.cancel()
         stopped_any = True
 
-    for t in BOT_PLANNED_MESSAGE_TASKS.pop(bot_id, []):
-        try:
-            t.cancel()
-            stopped_any = True
-        except Exception:
-            pass
+    if _has_pending_planned_messages(bot_id, rt.pm_generation):
+        stopped_any = True
 
-    proc = BOT_PROCESSES.pop(bot_id, None)
+    proc = rt.proc
     if proc is None:
         await APP_STATE.cleanup_bot(bot_id)
         return stopped_any
@@ -745,24 +930,30 @@ async def _stop_bot_process(bot_id: str) -> bool:
 
     # Wait a bit; if it doesn't exit, kill the whole tree.
     try:
-        await asyncio.get_running_loop().run_in_executor(None, lambda: proc.wait(timeout=10))
-        return True
+        if await _wait_bot_proc(proc, timeout=10):
+            return True
     except Exception:
         pass
 
     pid = getattr(proc, "pid", None)
-    if pid:
+    if pid and os.name == "nt":
+        # Windows: kill process tree (bot python + chromium). Run in a thread:
+        # the selector loop uvicorn may use there has no subprocess support.
         try:
-            # Windows: kill process tree (bot python + chromium)
-            subprocess.run(
+            res = await asyncio.to_thread(
+                subprocess.run,
                 ["taskkill", "/PID", str(pid), "/T", "/F"],
                 stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
                 check=False,
+                timeout=15,
             )
-            return True
-        except Exception:
-            pass
+            if res.returncode == 0:
+                return True
+            err = (res.stderr or b"").decode(errors="replace").strip()
+            print(f"[bot-backend] taskkill failed for bot_id={bot_id} pid={pid} rc={res.returncode}: {err}")
+        except Exception as e:
+            print(f"[bot-backend] taskkill failed for bot_id={bot_id} pid={pid}: {e}")
 
     try:
         proc.kill()
@@ -796,55 +987,35 @@ async def finalize_bot(bot_id: str, authorization: Optional[str] = Header(defaul
     return {"ok": True, "bot_id": bot_id}
 
 
-@app.get("/bots/{bot_id}/transcript")
-async def bot_transcript(bot_id: str, format: str = Query(default="text"), authorization: Optional[str] = Header(default=None)):
-    _ok_auth(authorization)
-    s = await APP_STATE.get_bot(bot_id)
-    if not s:
-        raise HTTPException(status_code=404, detail={"error": "bot not found"})
-
-    if format == "json":
-        return {"bot_id": bot_id, "utterances": s.utterances}
-
-    lines: List[str] = []
-    for u in s.utterances:
-        speaker = u.get("speaker") or u.get("speaker_name") or "Unknown"
-        text = (u.get("transcription") or {}).get("transcript") or u.get("text") or ""
-        ts_ms = u.get("timestamp_ms")
-        if ts_ms:
-            t = datetime.fromtimestamp(ts_ms / 1000.0).strftime("%H:%M:%S")
-            lines.append(f"[{t}] {speaker}: {text}")
-        else:
-            lines.append(f"{speaker}: {text}")
-
-    return PlainTextResponse("\n".join(lines))
-
-
 @app.get("/bots/{bot_id}/transcript/stream")
 async def transcript_stream(bot_id: str, request: Request, access_token: Optional[str] = Query(default=None), authorization: Optional[str] = Header(default=None)):
     # Authenticate via Authorization header OR access_token query param (EventSource limitation).
     _ok_auth(authorization or access_token)
 
-    q = await APP_STATE.add_subscriber(bot_id)
-    if q is None:
+    sub = await APP_STATE.add_subscriber(bot_id)
+    if sub is None:
         raise HTTPException(status_code=404, detail={"error": "bot not found"})
 
     async def event_generator():
         try:
             # initial comment to open the stream
-            yield ": connected\n\n"
+            yield _SSE_HELLO
             while True:
                 if await request.is_disconnected():
                     break
-                try:
-                    utter = await asyncio.wait_for(q.get(), timeout=15)
-                except asyncio.TimeoutError:
-                    yield "event: ping\ndata: {}\n\n"
+                # Frames arrive pre-encoded in the session ring from APP_STATE.add_utterance.
+                if not await sub.wait(15):
+                    yield _SSE_PING
                     continue
-                payload = json.dumps(utter, ensure_ascii=False)
-                yield f"event: utterance\ndata: {payload}\n\n"
+                # Coalesce frames arriving within a short window into one write
+                # (still separate `utterance` events for the client).
+                if _SSE_COALESCE_SEC and sub.pending() < _SSE_COALESCE_MAX:
+                    await asyncio.sleep(_SSE_COALESCE_SEC)
+                chunks = sub.drain()
+                if chunks:
+                    yield chunks[0] if len(chunks) == 1 else b"".join(chunks)
         finally:
-            await APP_STATE.remove_subscriber(bot_id, q)
+            await APP_STATE.remove_subscriber(bot_id, sub)
 
     headers = {
         "Cache-Control": "no-cache",
@@ -857,20 +1028,37 @@ async def transcript_stream(bot_id: str, request: Request, access_token: Optiona
 @app.post("/captions")
 async def receive_caption(payload: Dict[str, Any]):
     # Accept captions posted from Playwright bot.
-    text = (payload.get("text") or "").strip()
-    if not text:
-        return JSONResponse({"ok": False, "error": "empty text"}, status_code=400)
+    res = await _ingest_caption(payload)
+    if res.get("error") == "empty text":
+        return ORJSONResponse(res, status_code=400)
+    return res
+
+
+@app.post("/captions/batch")
+async def receive_captions_batch(payload: List[Dict[str, Any]]):
+    # Bots coalesce finalized captions into one POST; ingest them in order.
+    results = [await _ingest_caption(item if isinstance(item, dict) else {}) for item in payload]
+    return {"ok": all(r.get("ok") for r in results), "results": results}
+
 
+async def _ingest_caption(payload: Dict[str, Any]) -> Dict[str, Any]:
+    # Resolve the bot first so stray captions (e.g. from a bot that is shutting
+    # down) are dropped before any normalization or utterance building.
     meet_link = (payload.get("meet_link") or "").strip()
     bot_id = (payload.get("bot_id") or "").strip()
 
     if not bot_id and meet_link:
         bot_id = await APP_STATE.get_bot_id_for_link(meet_link) or ""
 
-    if not bot_id:
+    # Lock-free fast path only; add_utterance re-checks under the lock.
+    if not bot_id or bot_id not in APP_STATE.by_bot_id:
         # If we can't map it, drop it (or you can auto-create a session here)
         return {"ok": False, "error": "unknown bot_id"}
 
+    text = (payload.get("text") or "").strip()
+    if not text:
+        return {"ok": False, "error": "empty text"}
+
     speaker = (payload.get("speaker") or "Unknown").strip() or "Unknown"
     ts = payload.get("ts") or time.time()
     try:
@@ -878,6 +1066,10 @@ async def receive_caption(payload: Dict[str, Any]):
     except Exception:
         ts_f = time.time()
 
+    # Bots re-post identical segments; drop quick repeats before fan-out and RAG triggers.
+    if APP_STATE.is_duplicate_caption(bot_id, speaker, text, ts_f):
+        return {"ok": True, "dedup": True}
+
     utter = {
         "id": payload.get("id") or uuid.uuid4().hex,
         "speaker": speaker,
@@ -897,31 +1089,30 @@ async def receive_caption(payload: Dict[str, Any]):
     except Exception as e:
         print("Auto reply error:", e)
 
-    # Existing keyword triggers
-    try:
-        await _maybe_trigger_keyword_planned_messages(bot_id, meet_link=meet_link, text=text)
-    except Exception:
-        pass
-
-    return {"ok": True}
     # Trigger any keyword-based planned messages using incoming transcript.
-    try:
-        await _maybe_trigger_keyword_planned_messages(bot_id, meet_link=meet_link, text=text)
-    except Exception:
-        pass
+    if APP_STATE.has_keyword_triggers:
+        try:
+            await _maybe_trigger_keyword_planned_messages(bot_id, meet_link=meet_link, text=text)
+        except Exception:
+            pass
+
     return {"ok": True}
 
 
-@app.post("/bots/summarize")
-async def bots_summarize(req: SummarizeRequest, authorization: Optional[str] = Header(default=None)):
-    _ok_auth(authorization)
-    s = await APP_STATE.get_bot(req.bot_id)
+def _parse_start_time_utc(s: Optional[str]) -> Optional[datetime]:
+    """Parse a stored start_time as naive UTC (naive input is taken as UTC); None if missing/invalid."""
     if not s:
-        raise HTTPException(status_code=404, detail={"error": "bot not found"})
-    # Minimal placeholder summary: last ~10 utterances concatenated.
-    last = s.utterances[-10:]
-    text = " ".join(((u.get("transcription") or {}).get("transcript") or u.get("text") or "").strip() for u in last if u)
-    return {"summary": text.strip()}
+        return None
+    try:
+        if _ciso_parse_datetime is not None:
+            dt = _ciso_parse_datetime(s)
+        else:
+            dt = datetime.fromisoformat(s[:-1] + "+00:00" if s.endswith("Z") else s)
+    except Exception:
+        return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
 
 
 @app.get("/meetings/past", response_model=List[PastMeeting])
@@ -941,11 +1132,12 @@ async def meetings_past(
     # Prefer persisted meetings from Supabase when configured
     try:
         if user_id:
-            res = _sb_fetch(user_id=user_id, limit=limit)
+            res = _sb_fetch_cached(user_id=user_id, limit=limit)
             if res.get("ok"):
+                # Rows are trusted DB output: skip pydantic validation.
                 for row in (res.get("rows") or []):
                     try:
-                        items.append(PastMeeting(
+                        items.append(PastMeeting.model_construct(
                             event_id=row.get("event_id"),
                             attendee_bot_id=row.get("attendee_bot_id"),
                             title=row.get("title"),
@@ -961,10 +1153,10 @@ async def meetings_past(
 
     # Fallback: use in-memory sessions seen in this process
     if not items:
-        for bot_id, s in list(APP_STATE.by_bot_id.items()):
+        for s in APP_STATE.sessions_snapshot():
             if not s.utterances:
                 continue
-            items.append(PastMeeting(
+            items.append(PastMeeting.model_construct(
                 event_id=s.event_id,
                 attendee_bot_id=s.bot_id,
                 title=s.title,
@@ -973,40 +1165,28 @@ async def meetings_past(
                 summary=None,
             ))
 
+    # Parse each start_time once; the days filter and the ordering share the result.
+    parsed = ((_parse_start_time_utc(i.start_time), i) for i in items)
+
     # Optional: filter by days window when a numeric value is provided
     try:
-        import datetime as _dt
         if str(days).lower().strip() not in ("all", "0"):
             dval = int(str(days))
-            cutoff = _dt.datetime.utcnow() - _dt.timedelta(days=dval)
-            def _parse_iso(s: Optional[str]) -> Optional[_dt.datetime]:
-                if not s:
-                    return None
-                try:
-                    # Accept both with and without trailing Z
-                    s2 = s.rstrip("Z")
-                    return _dt.datetime.fromisoformat(s2)
-                except Exception:
-                    return None
-            items = [i for i in items if (_parse_iso(i.start_time) or _dt.datetime.min) >= cutoff]
+            cutoff = datetime.utcnow() - timedelta(days=dval)
+            parsed = ((dt, i) for dt, i in parsed if (dt or datetime.min) >= cutoff)
     except Exception:
         pass
 
-    # Order and limit
+    # Order and limit in one pass: a bounded heap keeps only `limit` rows.
+    limit = max(limit, 0)
     if order == "desc":
-        try:
-            # Sort by start_time descending when available
-            import datetime as _dt
-            def _key(i: PastMeeting) -> _dt.datetime:
-                try:
-                    s = (i.start_time or "").rstrip("Z")
-                    return _dt.datetime.fromisoformat(s)
-                except Exception:
-                    return _dt.datetime.min
-            items.sort(key=_key, reverse=True)
-        except Exception:
-            items.reverse()
-    return items[:limit]
+        # Sort by start_time descending when available
+        top = heapq.nlargest(limit, parsed, key=lambda p: p[0] or datetime.min)
+    else:
+        top = itertools.islice(parsed, limit)
+    # Return a prebuilt response so FastAPI doesn't re-validate against response_model
+    # (kept on the route for the OpenAPI schema).
+    return ORJSONResponse([i.model_dump() for _, i in top])
 
 
 @app.get("/planned-messages")
@@ -1016,22 +1196,9 @@ async def list_planned_messages(
     authorization: Optional[str] = Header(default=None),
 ):
     _ok_auth(authorization)
-    items = list(APP_STATE.planned_messages.values())
-    if not event_id and not meet_link:
-        return {"items": items}
-
-    e = (event_id or "").strip()
-    m = (meet_link or "").strip()
-    filtered: List[Dict[str, Any]] = []
-    for pm in items:
-        if not isinstance(pm, dict):
-            continue
-        if e and (pm.get("event_id") or "").strip() != e:
-            continue
-        if m and (pm.get("meet_link") or "").strip() != m:
-            continue
-        filtered.append(pm)
-    return {"items": filtered}
+    # Indexed lookup: cost is proportional to the answer, not to all planned messages.
+    items = APP_STATE.planned_messages_filtered((event_id or "").strip(), (meet_link or "").strip())
+    return {"items": items}
 
 
 @app.post("/planned-messages")
@@ -1039,14 +1206,14 @@ async def create_planned_message(req: PlannedMessageCreate, authorization: Optio
     _ok_auth(authorization)
     pm_id = f"pm_{uuid.uuid4().hex[:10]}"
     payload = {"id": pm_id, "status": "pending", **req.model_dump()}
-    APP_STATE.planned_messages[pm_id] = payload
+    APP_STATE.put_planned_message(payload)
     # Best-effort: apply to existing bots too.
     try:
-        for bot_id, s in list(APP_STATE.by_bot_id.items()):
+        for s in APP_STATE.sessions_snapshot():
             if not s or s.state == "ended":
                 continue
             asyncio.create_task(_schedule_planned_messages_for_bot(
-                bot_id,
+                s.bot_id,
                 event_id=s.event_id,
                 meet_link=s.meet_link,
                 start_time_iso=s.start_time,
@@ -1059,7 +1226,7 @@ async def create_planned_message(req: PlannedMessageCreate, authorization: Optio
 @app.delete("/planned-messages/{pm_id}")
 async def delete_planned_message(pm_id: str, authorization: Optional[str] = Header(default=None)):
     _ok_auth(authorization)
-    APP_STATE.planned_messages.pop(pm_id, None)
+    APP_STATE.pop_planned_message(pm_id)
     return {"ok": True}
 
 
@@ -1072,10 +1239,11 @@ async def rag_ingest_bot(req: RAGIngestBotRequest, authorization: Optional[str]
 
     # Build transcript text and generate a summary ONLY (do not ingest full transcript)
     try:
-        text = APP_STATE._build_transcript_text(list(s.utterances))  # type: ignore[attr-defined]
+        text = "\n".join(s.transcript_lines)
     except Exception:
         text = ""
-    summary = APP_STATE._groq_summarize(text, title=s.title) or APP_STATE._simple_summarize(text)  # type: ignore[attr-defined]
+    # Off the event loop, under the same Groq concurrency limit as finalize.
+    summary = await APP_STATE.summarize_text(text, s.title)
 
     # Fallback minimal summary if nothing captured
     if not (summary or "").strip():
@@ -1099,7 +1267,7 @@ async def rag_ingest_bot(req: RAGIngestBotRequest, authorization: Optional[str]
     except Exception as e:
         # If Supabase backend requested but not configured, return guidance
         if backend == "supabase":
-            return JSONResponse({
+            return ORJSONResponse({
                 "ok": False,
                 "reason": "supabase-not-configured",
                 "error": str(e),
@@ -1113,7 +1281,7 @@ async def rag_ingest_bot(req: RAGIngestBotRequest, authorization: Optional[str]
                 },
             }, status_code=400)
         # Otherwise generic store unavailable
-        return JSONResponse({
+        return ORJSONResponse({
             "ok": False,
             "reason": "rag-store-unavailable",
             "error": str(e),
@@ -1134,13 +1302,13 @@ async def rag_ingest_bot(req: RAGIngestBotRequest, authorization: Optional[str]
     except Exception as e:
         # Surface Supabase-specific guidance when backend is supabase
         if backend == "supabase":
-            return JSONResponse({
+            return ORJSONResponse({
                 "ok": False,
                 "reason": "supabase-ingest-failed",
                 "error": str(e),
                 "hint": "Ensure pgvector functions exist and SUPABASE_URL/SUPABASE_SERVICE_ROLE_KEY are correct.",
             }, status_code=400)
-        return JSONResponse({
+        return ORJSONResponse({
             "ok": False,
             "reason": "ingest-failed",
             "error": str(e),
@@ -1164,12 +1332,16 @@ async def rag_ingest_summary_units(
     uid = _extract_user_id_from_jwt(authorization)
 
     # Fetch meeting from Supabase
-    result = supabase.table("meetings") \
+    sb = _sb_client()
+    if sb is None:
+        raise HTTPException(status_code=503, detail="Supabase client not available")
+    query = sb.table("meetings") \
         .select("*") \
         .eq("event_id", req.event_id) \
         .eq("user_id", uid) \
-        .single() \
-        .execute()
+        .single()
+    # Blocking HTTP call; keep it off the event loop (caption fan-out runs there).
+    result = await asyncio.to_thread(query.execute)
 
     if not result.data:
         raise HTTPException(status_code=404, detail="Meeting not found")
@@ -1194,7 +1366,9 @@ async def rag_ingest_summary_units(
     )
 
     try:
-        res = ingest_summary_units_for_bot(bot_session=synth)
+        from .rag_pipeline import ingest_summary_units_for_bot
+        # Local embedding + Supabase RPCs: run in a worker thread, as finalize does.
+        res = await asyncio.to_thread(ingest_summary_units_for_bot, bot_session=synth)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -1219,7 +1393,8 @@ async def rag_answer(req: RAGQueryRequest, authorization: Optional[str] = Header
     if req.meeting_link:
         filters["meeting_id"] = req.meeting_link  # treat meeting_link as id if needed
     user_id = os.getenv("RAG_USER_ID", "local")
-    res = answer_question_with_rag(
+    from .rag_pipeline import answer_question_with_rag_async
+    res = await answer_question_with_rag_async(
         question=req.question or "",
         user_id=user_id,
         filters=filters,
@@ -1243,7 +1418,7 @@ async def resolve_bot_id(
     # Attempt Supabase lookup
     try:
         uid = _extract_user_id_from_jwt(authorization)
-        res = _sb_fetch(user_id=uid, meet_link=(meet_link or None), limit=50)
+        res = _sb_fetch_cached(user_id=uid, meet_link=(meet_link or None), limit=50)
         if res.get("ok"):
             rows = res.get("rows") or []
             # Prefer exact meet_link match, otherwise match event_id
@@ -1277,7 +1452,7 @@ async def resolve_bot_id(
             pass
 
     # Not found
-    return JSONResponse({"bot_id": None, "error": "not-found"}, status_code=404)
+    return ORJSONResponse({"bot_id": None, "error": "not-found"}, status_code=404)
 
 
 @app.post("/rag/query")
@@ -1291,7 +1466,8 @@ async def rag_query(req: RAGQueryRequest, authorization: Optional[str] = Header(
         filters["meeting_link"] = req.meeting_link
     if req.bot_id:
         filters["bot_id"] = req.bot_id
-    out = answer_question_with_rag(
+    from .rag_pipeline import answer_question_with_rag_async
+    out = await answer_question_with_rag_async(
         question=req.question or "",
         user_id=user_id,
         filters=filters,
@@ -1342,13 +1518,8 @@ async def _start_bot_process(bot_id: str, meet_link: str, chat_on_join: str = ""
         with log_path.open("a", encoding="utf-8") as f:
             f.write(f"\n--- launch {datetime.now().isoformat()} bot_id={bot_id} meet_link={meet_link} ---\n")
             f.flush()
-            proc = subprocess.Popen(
-                [py, "-u", str(BOT_PY_PATH)],
-                env=env,
-                stdout=f,
-                stderr=f,
-            )
-            BOT_PROCESSES[bot_id] = proc
+            proc = await _spawn_bot_proc([py, "-u", str(BOT_PY_PATH)], env=env, log_file=f)
+            _bot_rt(bot_id).proc = proc
             # Watch for process exit and finalize the meeting
             asyncio.create_task(_watch_bot_exit(bot_id))
     except Exception:
@@ -1356,21 +1527,43 @@ async def _start_bot_process(bot_id: str, meet_link: str, chat_on_join: str = ""
         return
 
 
+async def _spawn_bot_proc(args: List[str], *, env: Dict[str, str], log_file: Any):
+    """Spawn the bot via asyncio; fall back to Popen on loops without subprocess
+    support (e.g. the selector loop uvicorn uses on Windows with --reload)."""
+    try:
+        return await asyncio.create_subprocess_exec(*args, env=env, stdout=log_file, stderr=log_file)
+    except NotImplementedError:
+        return subprocess.Popen(args, env=env, stdout=log_file, stderr=log_file)
+
+
+async def _wait_bot_proc(proc: Any, timeout: Optional[float] = None) -> bool:
+    """Wait for a bot process to exit. Returns False if `timeout` elapsed first."""
+    if isinstance(proc, asyncio.subprocess.Process):
+        try:
+            await asyncio.wait_for(proc.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+    # Popen fallback: poll without holding a threadpool slot.
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while proc.poll() is None:
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(0.1 if deadline is not None else 1.0)
+    return True
+
+
 async def _watch_bot_exit(bot_id: str) -> None:
     """Background watcher: when the bot process exits, mark meeting as ended.
 
     This provides a reliable finalize trigger even if end-of-meeting webhooks are missing.
     """
-    proc = BOT_PROCESSES.get(bot_id)
+    rt = BOT_RT.get(bot_id)
+    proc = rt.proc if rt is not None else None
     if proc is None:
         return
     try:
-        # Poll until the process exits
-        while True:
-            code = proc.poll()
-            if code is not None:
-                break
-            await asyncio.sleep(1.0)
+        await _wait_bot_proc(proc)
     except Exception:
         pass
     # Process ended; mark state and finalize
@@ -1383,6 +1576,8 @@ async def _watch_bot_exit(bot_id: str) -> None:
 # Entrypoint for local dev:
 #   python -m bot.backend.app.main (from repo root) isn't used; run via uvicorn:
 #   uvicorn bot.backend.app.main:app --reload --port 8010
+# The event loop is uvicorn's choice: its default --loop auto uses uvloop when
+# installed (not on Windows); pass --loop uvloop to require it.
 
 # Optional: allow direct execution for convenience
 if __name__ == "__main__":
@@ -1392,7 +1587,8 @@ if __name__ == "__main__":
         print("[bot-backend] uvicorn not installed. Install with: pip install uvicorn[standard]")
         raise
     # Run the FastAPI app directly. For auto-reload, prefer the uvicorn CLI.
-    uvicorn.run(app, host="127.0.0.1", port=PORT, reload=False)
+    # loop="auto" selects uvloop when it is installed.
+    uvicorn.run(app, host="127.0.0.1", port=PORT, reload=False, loop="auto")
 
 
 @app.post("/bots/{bot_id}/state")
@@ -1403,9 +1599,8 @@ async def set_bot_state(bot_id: str, payload: Dict[str, Any], authorization: Opt
     """
     _ok_auth(authorization)
     state = (payload.get("state") or "").strip()
-    allowed = {"scheduled", "joining", "running", "ended", "error"}
-    if state not in allowed:
-        raise HTTPException(status_code=400, detail={"error": "invalid state", "allowed": sorted(list(allowed))})
+    if state not in _BOT_STATES:
+        raise HTTPException(status_code=400, detail={"error": "invalid state", "allowed": sorted(_BOT_STATES)})
     s = await APP_STATE.get_bot(bot_id)
     if not s:
         raise HTTPException(status_code=404, detail={"error": "bot not found"})
@@ -1427,24 +1622,25 @@ async def finalize_bot(bot_id: str, authorization: Optional[str] = Header(defaul
     await APP_STATE.set_state(bot_id, "ended")
     return {"ok": True, "bot_id": bot_id, "finalized": True}
 
+# Speaker names the bot posts under; never auto-reply to these.
+_SELF_SPEAKERS = frozenset({"ai assistant", "bot", "assistant"})
+
+
 async def _auto_reply_if_question(bot_id: str, speaker: str, text: str):
-    q = (text or "").strip()
-    if not q:
+    # Cheapest exits first: most captions are not questions.
+    if not text or "?" not in text:
         return
 
-    lower = q.lower()
-
     # Prevent bot replying to itself
-    if speaker.lower() in ["ai assistant", "bot", "assistant"]:
+    if (speaker or "").casefold() in _SELF_SPEAKERS:
         return
 
+    lower = text.strip().lower()
+
     # Only respond if someone calls the bot
     if "assistant" not in lower:
         return
 
-    if "?" not in lower:
-        return
-
     question = lower.split("assistant", 1)[1].strip()
 
 
@@ -1460,7 +1656,8 @@ async def _auto_reply_if_question(bot_id: str, speaker: str, text: str):
         }
 
         # 🔹 Directly call RAG core function
-        out = answer_question_with_rag(
+        from .rag_pipeline import answer_question_with_rag_async
+        out = await answer_question_with_rag_async(
             question=question,
             user_id=os.getenv("RAG_USER_ID", "local"),
             filters=filters,
@@ -1,17 +1,73 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import hashlib
+import io
 import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple, Union
 from pathlib import Path
 
-from supabase import create_client, Client
+from .supabase_integration import get_client as _sb_client
+
+if TYPE_CHECKING:  # pragma: no cover
+    from supabase import Client
 
 try:
     from sentence_transformers import SentenceTransformer  # type: ignore
 except Exception:
     SentenceTransformer = None  # type: ignore
+try:
+    import numpy as np  # type: ignore  # installed with sentence-transformers
+except Exception:
+    np = None  # type: ignore
+try:
+    from groq import Groq  # type: ignore
+except Exception:
+    Groq = None  # type: ignore
+try:
+    from postgrest.exceptions import APIError as _PostgrestAPIError  # type: ignore  # installed with supabase
+except Exception:
+    _PostgrestAPIError = None  # type: ignore
+try:
+    from groq import AsyncGroq  # type: ignore
+except Exception:
+    AsyncGroq = None  # type: ignore
+
+# Texts per SentenceTransformer forward pass (encode() already length-sorts inputs).
+EMBED_BATCH_SIZE = max(1, int(os.getenv("RAG_EMBED_BATCH_SIZE", "128") or 128))
+
+# Opt-in: send the embedding arguments (insert_rag_doc/insert_rag_docs_bulk
+# p_embedding, match_rag_docs query_embedding) as pgvector text literals ("[x,y,...]")
+# rather than JSON float arrays. Only enable this when those functions declare the
+# parameters as `vector` (a float8[] parameter rejects the string).
+PGVECTOR_LITERAL = os.getenv("RAG_PGVECTOR_LITERAL", "0") == "1"
+_fmt_f32 = "{:.9g}".format  # 9 significant digits round-trip float32 exactly
+
+# Cap on bytes read from a persisted summary file.
+MAX_SUMMARY_BYTES = 256 * 1024
+
+# Summary parsing patterns, compiled once at import.
+_BULLET_RE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+_DECISION_RE = re.compile(r"\b(decided|agreed|approved|committed|finalized|resolved)\b")
+_ACTION_RE = re.compile(r"^(assign|create|send|prepare|follow up|schedule|update|implement|fix|investigate|review|write|document|deploy|test)\b")
+# Section heading prefix -> section name (first match wins).
+_SECTION_PREFIXES: Tuple[Tuple[str, str], ...] = (
+    ("overview", "overview"),
+    ("key discussion points", "key_points"),
+    ("key points", "key_points"),
+    ("decisions", "decisions"),
+    ("action items", "actions"),
+    ("open questions", "open_questions"),
+)
+# pgvector error text for an embedding of the wrong size.
+_DIM_MISMATCH_RE = re.compile(r"expected\s+(\d+)\s+dimensions")
 
 
 @dataclass
@@ -24,6 +80,53 @@ class SummaryUnit:
     metadata: Optional[Dict[str, Any]] = None
 
 
+def _iter_sentences(text: str) -> Iterator[str]:
+    """Split on whitespace after . ! ? and on newline runs, in one lazy scan.
+
+    Same pieces as re.split(r"(?<=[.!?])\\s+|\\n+", text), stripped, empties dropped.
+    """
+    n = len(text)
+    start = i = 0
+    while i < n:
+        c = text[i]
+        if c in ".!?" and i + 1 < n and text[i + 1].isspace():
+            end, i = i + 1, i + 1
+            while i < n and text[i].isspace():
+                i += 1
+        elif c == "\n":
+            end = i
+            while i < n and text[i] == "\n":
+                i += 1
+        else:
+            i += 1
+            continue
+        piece = text[start:end].strip()
+        if piece:
+            yield piece
+        start = i
+    piece = text[start:].strip()
+    if piece:
+        yield piece
+
+
+def _classify_unit(content: str) -> str:
+    """Heuristic unit type; questions exit before any lowercasing or regex work."""
+    if "?" in content:
+        return "open_question"
+    low = content.lower()
+    if _DECISION_RE.search(low):
+        return "decision"
+    if _ACTION_RE.match(low):
+        return "action_item"
+    return "other"
+
+
+# parse_structured_summary memo: blake2b(summary) -> ((text, type), ...), LRU order.
+_PARSE_CACHE: "OrderedDict[bytes, Tuple[Tuple[str, str], ...]]" = OrderedDict()
+_PARSE_CACHE_MAX = 256
+_parse_cache_lock = threading.Lock()
+
+
 def parse_structured_summary(summary: str, title: str = "") -> List[SummaryUnit]:
     """Parse a structured summary into granular units with robust fallbacks.
 
@@ -36,50 +139,61 @@ def parse_structured_summary(summary: str, title: str = "") -> List[SummaryUnit]
       * decision: contains keywords like decided/agreed/approved/committed/finalized
       * action_item: starts with imperative verbs like assign/create/send/prepare/follow up/schedule/update/implement/fix/investigate/review/write/document/deploy/test
       * other: anything else
-    """
-    import re
 
+    Results are memoized by a digest of the summary text (bounded LRU); every call
+    returns fresh SummaryUnit objects, so callers may mutate them.
+    """
     text = (summary or "").strip()
     if not text:
         return []
-
-    lines = [l.rstrip() for l in text.splitlines()]
+    key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+    with _parse_cache_lock:
+        pairs = _PARSE_CACHE.get(key)
+        if pairs is not None:
+            _PARSE_CACHE.move_to_end(key)
+    if pairs is None:
+        pairs = tuple((u.text, u.type) for u in _parse_structured_summary_impl(text))
+        with _parse_cache_lock:
+            _PARSE_CACHE[key] = pairs
+            if len(_PARSE_CACHE) > _PARSE_CACHE_MAX:
+                _PARSE_CACHE.popitem(last=False)
+    return [SummaryUnit(text=t, type=typ) for t, typ in pairs]
+
+
+def _parse_structured_summary_impl(text: str) -> List[SummaryUnit]:
+    """Uncached parser behind parse_structured_summary (text is already stripped)."""
     sec: Optional[str] = None
     decisions: List[str] = []
     actions: List[str] = []
     questions: List[str] = []
     other: List[str] = []
     overview_lines: List[str] = []
-
-    def _is_bullet(l: str) -> bool:
-        return bool(re.match(r"^\s*(?:[-*•]|\d+[.)])\s+", l))
-
-    def _set_section(l: str) -> bool:
-        low = l.strip().lower().rstrip(':')
-        if low.startswith("overview"):
-            nonlocal sec; sec = "overview"; return True
-        if low.startswith("key discussion points") or low.startswith("key points"):
-            sec = "key_points"; return True
-        if low.startswith("decisions") or low.startswith("decisions made"):
-            sec = "decisions"; return True
-        if low.startswith("action items"):
-            sec = "actions"; return True
-        if low.startswith("open questions"):
-            sec = "open_questions"; return True
-        return False
-
-    # Pass 1: collect bullets under detected sections
-    for l in lines:
-        if not l.strip():
+    by_type = {"open_question": questions, "decision": decisions, "action_item": actions, "other": other}
+
+    def _section_of(stripped: str) -> Optional[str]:
+        low = stripped.lower().rstrip(':')
+        for prefix, name in _SECTION_PREFIXES:
+            if low.startswith(prefix):
+                return name
+        return None
+
+    # Pass 1: collect bullets under detected sections (each line stripped once).
+    # Lines are read lazily rather than materialized up front; newline=None keeps
+    # \r and \r\n line breaks working as with splitlines().
+    for l in io.StringIO(text, newline=None):
+        l = l.strip()
+        if not l:
             continue
-        if _set_section(l):
+        heading = _section_of(l)
+        if heading is not None:
+            sec = heading
             continue
         if sec == "overview":
-            if l.strip():
-                overview_lines.append(l.strip())
+            overview_lines.append(l)
             continue
-        if _is_bullet(l):
-            content = re.sub(r"^\s*(?:[-*•]|\d+[.)])\s+", "", l).strip()
+        m = _BULLET_RE.match(l)
+        if m:
+            content = l[m.end():].strip()
             if sec == "decisions":
                 decisions.append(content)
             elif sec == "actions":
@@ -88,132 +202,252 @@ def parse_structured_summary(summary: str, title: str = "") -> List[SummaryUnit]
                 questions.append(content)
             else:
                 # If no active section, classify heuristically
-                low = content.lower()
-                if "?" in content:
-                    questions.append(content)
-                elif re.search(r"\b(decided|agreed|approved|committed|finalized|resolved)\b", low):
-                    decisions.append(content)
-                elif re.match(r"^(assign|create|send|prepare|follow up|schedule|update|implement|fix|investigate|review|write|document|deploy|test)\b", low):
-                    actions.append(content)
-                else:
-                    other.append(content)
+                by_type[_classify_unit(content)].append(content)
         else:
             # Non-bullet lines: keep questions, otherwise ignore here
             if (sec in ("key_points", "open_questions") or sec is None) and ("?" in l):
-                questions.append(l.strip())
+                questions.append(l)
     
-    units: List[SummaryUnit] = []
-    if overview_lines:
-        overview_text = " ".join(overview_lines).strip()
-        units.append(SummaryUnit(text=overview_text, type="overview"))
-    units += [SummaryUnit(text=d, type="decision") for d in decisions]
-    units += [SummaryUnit(text=a, type="action_item") for a in actions]
-    units += [SummaryUnit(text=q, type="open_question") for q in questions]
-    units += [SummaryUnit(text=o, type="other") for o in other]
-
-    if units:
+    # Counts are known now: size the result once and fill it by index.
+    total = (1 if overview_lines else 0) + len(decisions) + len(actions) + len(questions) + len(other)
+    if total:
+        units: List[SummaryUnit] = [None] * total  # type: ignore[list-item]
+        i = 0
+        if overview_lines:
+            units[0] = SummaryUnit(text=" ".join(overview_lines).strip(), type="overview")
+            i = 1
+        for typ, items in (("decision", decisions), ("action_item", actions), ("open_question", questions), ("other", other)):
+            for t in items:
+                units[i] = SummaryUnit(text=t, type=typ)
+                i += 1
         return units
 
     # Fallback: split into sentences and classify
-    parts = [p.strip() for p in re.split(r"(?<=[.!?])\s+|\n+", text) if p.strip()]
-    for p in parts:
-        low = p.lower()
-        if "?" in p:
-            units.append(SummaryUnit(text=p, type="open_question"))
-        elif re.search(r"\b(decided|agreed|approved|committed|finalized|resolved)\b", low):
-            units.append(SummaryUnit(text=p, type="decision"))
-        elif re.match(r"^(assign|create|send|prepare|follow up|schedule|update|implement|fix|investigate|review|write|document|deploy|test)\b", low):
-            units.append(SummaryUnit(text=p, type="action_item"))
-        else:
-            units.append(SummaryUnit(text=p, type="other"))
-    return units
+    return [SummaryUnit(text=p, type=_classify_unit(p)) for p in _iter_sentences(text)]
+
+
+def _resolve_embed_model_name(model_name: Optional[str] = None) -> str:
+    # Prefer explicit model via env; otherwise allow dimension-driven defaults
+    # If you use pgvector(1024), a good default is 'intfloat/e5-large-v2' (1024 dims)
+    # If you use pgvector(384), default 'all-MiniLM-L6-v2' (384 dims)
+    target_dim_env = os.getenv("RAG_VECTOR_DIM") or os.getenv("SUPABASE_VECTOR_DIM")
+    default_model = None
+    if target_dim_env:
+        try:
+            td = int(target_dim_env)
+            if td == 1024:
+                default_model = "intfloat/e5-large-v2"
+            elif td == 768:
+                default_model = "all-mpnet-base-v2"
+            elif td == 384:
+                default_model = "all-MiniLM-L6-v2"
+        except Exception:
+            pass
+    return model_name or os.getenv("RAG_LOCAL_EMBED_MODEL", default_model or "all-MiniLM-L6-v2")
+
+
+def _vector_param(vec: Any) -> Union[str, List[float]]:
+    """RPC argument for an embedding: a float list, or a pgvector literal with RAG_PGVECTOR_LITERAL=1."""
+    values = vec.tolist() if hasattr(vec, "tolist") else list(vec)
+    if not PGVECTOR_LITERAL:
+        return values
+    # One string instead of a JSON array of float64 reprs: roughly half the bytes of
+    # this argument (insert payloads still carry the float list in p_metadata).
+    return "[" + ",".join(map(_fmt_f32, values)) + "]"
+
+
+def _fit_dim(arr: "np.ndarray", dim: int) -> "np.ndarray":
+    """Zero-pad or truncate the last axis of a vector / (N, D) matrix to `dim` in one copy."""
+    have = arr.shape[-1]
+    if have == dim:
+        return arr
+    if have > dim:
+        return arr[..., :dim]
+    out = np.zeros(arr.shape[:-1] + (dim,), dtype=arr.dtype)
+    out[..., :have] = arr
+    return out
 
 
 class LocalEmbedder:
     """Local sentence-transformers embedder (production-friendly).
 
     Default: all-MiniLM-L6-v2 (384 dims). Override via RAG_LOCAL_EMBED_MODEL.
+    Use _get_embedder() to share one loaded model per process.
+    Opt-in reduced precision: RAG_EMBED_FP16=1 (CUDA) or RAG_EMBED_INT8=1 (CPU).
     """
     def __init__(self, model_name: Optional[str] = None):
-        # Prefer explicit model via env; otherwise allow dimension-driven defaults
-        # If you use pgvector(1024), a good default is 'intfloat/e5-large-v2' (1024 dims)
-        # If you use pgvector(384), default 'all-MiniLM-L6-v2' (384 dims)
-        target_dim_env = os.getenv("RAG_VECTOR_DIM") or os.getenv("SUPABASE_VECTOR_DIM")
-        default_model = None
-        if target_dim_env:
-            try:
-                td = int(target_dim_env)
-                if td == 1024:
-                    default_model = "intfloat/e5-large-v2"
-                elif td == 768:
-                    default_model = "all-mpnet-base-v2"
-                elif td == 384:
-                    default_model = "all-MiniLM-L6-v2"
-            except Exception:
-                pass
-        name = model_name or os.getenv("RAG_LOCAL_EMBED_MODEL", default_model or "all-MiniLM-L6-v2")
+        name = _resolve_embed_model_name(model_name)
         if SentenceTransformer is None:
             raise RuntimeError("sentence-transformers not installed. pip install sentence-transformers")
         self.model = SentenceTransformer(name)
+        self._reduce_precision()
+
+    def _reduce_precision(self) -> None:
+        """Half precision on CUDA or dynamic int8 Linear layers on CPU; stays FP32 on any failure."""
+        want_fp16 = os.getenv("RAG_EMBED_FP16", "0") == "1"
+        want_int8 = os.getenv("RAG_EMBED_INT8", "0") == "1"
+        if not (want_fp16 or want_int8):
+            return
+        try:
+            import torch  # type: ignore  # installed with sentence-transformers
+
+            on_cuda = str(getattr(self.model, "device", "cpu")).startswith("cuda")
+            if want_fp16 and on_cuda:
+                self.model.half()
+            elif want_int8 and not on_cuda:
+                self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        except Exception as e:
+            print("Embedding precision reduction skipped:", e)
+
+    def embed(self, texts: List[str]) -> "np.ndarray":
+        """Embed texts as a float32 array of shape (len(texts), dim).
+
+        Rows stay numpy until the JSON boundary (RPC payloads) to avoid boxing every float.
+        """
+        return self.model.encode(texts, batch_size=EMBED_BATCH_SIZE, convert_to_numpy=True, normalize_embeddings=True)
+
+
+_embedder_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=4)
+def _load_embedder(name: str) -> LocalEmbedder:
+    return LocalEmbedder(name)
+
 
-    def embed(self, texts: List[str]) -> List[List[float]]:
-        vecs = self.model.encode(texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=True)
-        return [v.tolist() for v in vecs]
+def _get_embedder(model_name: Optional[str] = None) -> LocalEmbedder:
+    """Warm LocalEmbedder for the resolved model name (weights load once per process)."""
+    name = _resolve_embed_model_name(model_name)
+    # Serialize first loads so concurrent callers don't each load the weights.
+    with _embedder_lock:
+        return _load_embedder(name)
+
+
+# Cleared after the database reports insert_rag_docs_bulk as missing.
+_bulk_rpc_available = True
+# Embedding size the database expects, learned from a dimension-mismatch error.
+_db_embed_dim: Optional[int] = None
+# Cleared after match_rag_docs rejects the fallback_no_filter argument.
+_match_fallback_rpc = True
+# Max concurrent insert_rag_doc calls when falling back to per-row inserts.
+RAG_INSERT_CONCURRENCY = max(1, int(os.getenv("RAG_INSERT_CONCURRENCY", "5") or 5))
+
+
+def _is_rpc_rejection(e: Exception) -> bool:
+    """PostgREST answered with an error, so the call's transaction was rolled back.
+
+    Anything else (timeouts, dropped connections) may have committed server-side.
+    """
+    return _PostgrestAPIError is not None and isinstance(e, _PostgrestAPIError)
+
+
+def _is_missing_rpc(e: Exception) -> bool:
+    """PostgREST PGRST202: no function with that name/argument set."""
+    return getattr(e, "code", None) == "PGRST202" or "Could not find the function" in str(e)
 
 
 class RAGSupabase:
     def __init__(self):
-        url = (os.getenv("SUPABASE_URL") or "").strip()
-        key = (os.getenv("SUPABASE_SERVICE_ROLE_KEY") or "").strip()
-        if not url or not key:
+        # Shared process-wide client (keep-alive pool), not a new connection per call.
+        sb = _sb_client()
+        if sb is None:
             raise RuntimeError("Supabase config missing: set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY")
-        self.sb: Client = create_client(url, key)
+        self.sb: Client = sb
+
+    @staticmethod
+    def _unit_payload(user_id: str, u: SummaryUnit) -> Optional[Dict[str, Any]]:
+        """insert_rag_doc arguments for one unit, or None if it has no embedding."""
+        emb = u.metadata.get("embedding") if u.metadata else None
+        if emb is None or len(emb) == 0:
+            return None
+        bot_id = (u.metadata or {}).get("bot_id")
+        meeting_link = (u.metadata or {}).get("meeting_link")
+        metadata = dict(u.metadata or {})
+        # JSON boundary: one C-level conversion of the numpy row for the metadata copy.
+        metadata["embedding"] = emb.tolist() if hasattr(emb, "tolist") else list(emb)
+        return {
+            "p_bot_id": bot_id,
+            "p_embedding": _vector_param(emb),
+            "p_external_id": u.meeting_id,
+            "p_meeting_link": meeting_link if meeting_link else None,
+            "p_metadata": metadata,
+            "p_source": "summary",
+            "p_text": u.text,
+            "p_title": u.meeting_title,
+            "p_user_id": user_id,
+        }
+
+    @staticmethod
+    def _fit_payload(payload: Dict[str, Any], dim: int) -> None:
+        vec = np.asarray(payload["p_metadata"]["embedding"], dtype=np.float32)
+        payload["p_embedding"] = _vector_param(_fit_dim(vec, dim))
+
+    def _insert_one(self, payload: Dict[str, Any]) -> None:
+        global _db_embed_dim
+        try:
+            self.sb.rpc("insert_rag_doc", payload).execute()
+        except Exception as e:
+            # Auto-recover if dimension mismatch (e.g., expected 1024, not 384)
+            m = _DIM_MISMATCH_RE.search(str(e)) if _is_rpc_rejection(e) else None
+            if not m:
+                raise
+            _db_embed_dim = int(m.group(1))
+            self._fit_payload(payload, _db_embed_dim)
+            self.sb.rpc("insert_rag_doc", payload).execute()
 
     def insert_units(self, user_id: str, units: List[SummaryUnit]) -> int:
-        inserted = 0
-        for u in units:
-            emb = u.metadata.get("embedding") if u.metadata else None
-            if not emb:
-                continue
-            bot_id = (u.metadata or {}).get("bot_id")
-            meeting_link = (u.metadata or {}).get("meeting_link")
-            metadata = dict(u.metadata or {})
-            payload = {
-                "p_bot_id": bot_id,
-                "p_embedding": emb,
-                "p_external_id": u.meeting_id,
-                "p_meeting_link": meeting_link if meeting_link else None,
-                "p_metadata": metadata,
-                "p_source": "summary",
-                "p_text": u.text,
-                "p_title": u.meeting_title,
-                "p_user_id": user_id,
-            }
+        """Insert embedded units; one round trip via insert_rag_docs_bulk when the database has it.
+
+        insert_rag_docs_bulk(p_rows jsonb) takes an array of insert_rag_doc argument
+        objects and inserts them in one transaction. A dimension mismatch is remembered
+        and the batch resent with resized embeddings. Without the function, or when
+        PostgREST rejects the batch for another reason (so nothing was committed), rows
+        go through insert_rag_doc individually, up to RAG_INSERT_CONCURRENCY at a time.
+        Transport errors are re-raised: the batch may have committed, and retrying it
+        row by row would insert every unit twice.
+        """
+        global _bulk_rpc_available, _db_embed_dim
+        payloads = [p for p in (self._unit_payload(user_id, u) for u in units) if p is not None]
+        if not payloads:
+            return 0
+        if _db_embed_dim is not None:
+            for payload in payloads:
+                self._fit_payload(payload, _db_embed_dim)
+        attempts = 2 if _bulk_rpc_available else 0
+        for attempt in range(attempts):
             try:
-                self.sb.rpc("insert_rag_doc", payload).execute()
+                self.sb.rpc("insert_rag_docs_bulk", {"p_rows": payloads}).execute()
+                return len(payloads)
             except Exception as e:
-                # Auto-recover if dimension mismatch (e.g., expected 1024, not 384)
-                msg = str(e)
-                import re as _re
-                m = _re.search(r"expected\s+(\d+)\s+dimensions", msg)
-                if m:
-                    try:
-                        target = int(m.group(1))
-                        vec = list(emb)
-                        if len(vec) < target:
-                            vec = vec + [0.0] * (target - len(vec))
-                        elif len(vec) > target:
-                            vec = vec[:target]
-                        payload["p_embedding"] = vec
-                        self.sb.rpc("insert_rag_doc", payload).execute()
-                    except Exception:
-                        raise
-                else:
+                if not _is_rpc_rejection(e):
                     raise
-            inserted += 1
-        return inserted
+                # Function not deployed: stop trying it in this process.
+                if _is_missing_rpc(e):
+                    _bulk_rpc_available = False
+                    break
+                m = _DIM_MISMATCH_RE.search(str(e))
+                if attempt or not m:
+                    break
+                _db_embed_dim = int(m.group(1))
+                for payload in payloads:
+                    self._fit_payload(payload, _db_embed_dim)
+        if len(payloads) == 1 or RAG_INSERT_CONCURRENCY == 1:
+            for payload in payloads:
+                self._insert_one(payload)
+            return len(payloads)
+        # Rows are independent: overlap the round trips. The first failure is re-raised.
+        with ThreadPoolExecutor(max_workers=min(RAG_INSERT_CONCURRENCY, len(payloads))) as ex:
+            for _ in ex.map(self._insert_one, payloads):
+                pass
+        return len(payloads)
+
+    def match(self, user_id: str, query_embedding: Union[str, List[float]], top_k: int, min_similarity: float, filters: Optional[Dict[str, Any]] = None, fallback_no_filter: bool = False) -> List[Dict[str, Any]]:
+        """Top-k rows for the query embedding within user_id + filters.
 
-    def match(self, user_id: str, query_embedding: List[float], top_k: int, min_similarity: float, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        fallback_no_filter asks match_rag_docs to retry with only user_id in the same
+        call when the filtered search is empty (needs the fallback_no_filter argument
+        on the database function).
+        """
         flt = {"user_id": (user_id or "local").strip()}
         if filters:
             try:
@@ -221,14 +455,20 @@ class RAGSupabase:
             except Exception:
                 pass
         # Call RPC using the correct signature: (flt, match_count, query_embedding)
-        res = self.sb.rpc(
-            "match_rag_docs",
-            {"flt": flt, "match_count": int(top_k), "query_embedding": query_embedding},
-        ).execute()
+        params: Dict[str, Any] = {"flt": flt, "match_count": int(top_k), "query_embedding": query_embedding}
+        if fallback_no_filter:
+            params["fallback_no_filter"] = True
+        res = self.sb.rpc("match_rag_docs", params).execute()
         rows = res.data or []
         return rows
 
 
+@functools.lru_cache(maxsize=1)
+def _get_rag_store() -> RAGSupabase:
+    """Process-wide RAGSupabase (not cached until the client can be created)."""
+    return RAGSupabase()
+
+
 def ingest_summary_units_for_bot(*, bot_session: Any) -> Dict[str, Any]:
     """Split bot summary into units, embed locally, store in Supabase pgvector.
 
@@ -238,10 +478,14 @@ def ingest_summary_units_for_bot(*, bot_session: Any) -> Dict[str, Any]:
     title = getattr(bot_session, "title", "")
     summary = (getattr(bot_session, "summary_text", "") or "").strip()
     if not summary:
-        # Build from utterances and run same summarization path
+        # Build from the session's transcript lines (or raw utterances) and run same summarization path
         try:
             from .services.state import AppState
-            text = AppState._build_transcript_text(list(getattr(bot_session, "utterances", [])))  # type: ignore[attr-defined]
+            lines = getattr(bot_session, "transcript_lines", None)
+            if lines:
+                text = "\n".join(lines)
+            else:
+                text = AppState._build_transcript_text(getattr(bot_session, "utterances", []))  # type: ignore[attr-defined]
             summary = AppState._groq_summarize(text, title=title) or AppState._simple_summarize(text)  # type: ignore[attr-defined]
         except Exception:
             summary = summary or ""
@@ -252,8 +496,13 @@ def ingest_summary_units_for_bot(*, bot_session: Any) -> Dict[str, Any]:
             if bid:
                 base_dir = Path(__file__).resolve().parents[1] / "data" / "summaries"
                 p = base_dir / f"{bid}.txt"
-                if p.exists():
-                    summary = (p.read_text(encoding="utf-8") or "").strip()
+                # open() doubles as the existence check (FileNotFoundError lands below);
+                # empty files skip decoding and oversized ones are read only up to the cap.
+                with p.open("rb") as fh:
+                    size = os.fstat(fh.fileno()).st_size
+                    if size:
+                        raw = fh.read(min(size, MAX_SUMMARY_BYTES))
+                        summary = raw.decode("utf-8", errors="ignore").strip()
         except Exception:
             pass
 
@@ -262,24 +511,14 @@ def ingest_summary_units_for_bot(*, bot_session: Any) -> Dict[str, Any]:
         return {"ok": False, "reason": "no-units"}
 
     # Embed locally
-    embedder = LocalEmbedder()
+    embedder = _get_embedder()
     embeds = embedder.embed([u.text for u in units])
     # Optionally enforce target vector dimension via env (pads/truncates if needed)
     target_dim_env = os.getenv("RAG_VECTOR_DIM") or os.getenv("SUPABASE_VECTOR_DIM")
     if target_dim_env:
         try:
             td = int(target_dim_env)
-            fixed: List[List[float]] = []
-            for v in embeds:
-                if len(v) == td:
-                    fixed.append(v)
-                elif len(v) < td:
-                    # pad with zeros
-                    fixed.append(v + [0.0] * (td - len(v)))
-                else:
-                    # truncate to target
-                    fixed.append(v[:td])
-            embeds = fixed
+            embeds = _fit_dim(embeds, td)
         except Exception:
             # If parsing fails, continue with original dims (may error downstream)
             pass
@@ -289,74 +528,69 @@ def ingest_summary_units_for_bot(*, bot_session: Any) -> Dict[str, Any]:
     meeting_id = getattr(bot_session, "event_id", None)
     meeting_title = getattr(bot_session, "title", None)
     date_iso = getattr(bot_session, "start_time", None)
+    ml = (
+        getattr(bot_session, "meeting_link", None)
+        or getattr(bot_session, "meet_link", None)
+        or getattr(bot_session, "meeting_url", None)
+    )
+    # Fields shared by every unit; only embedding and type vary.
+    base_meta = {
+        "bot_id": getattr(bot_session, "bot_id", None),
+        "meeting_link": ml,
+        "date": date_iso,
+        "meeting_title": meeting_title,
+    }
     for u, e in zip(units, embeds):
         u.meeting_id = meeting_id
         u.meeting_title = meeting_title
         u.date = date_iso
-        ml = (
-            getattr(bot_session, "meeting_link", None)
-            or getattr(bot_session, "meet_link", None)
-            or getattr(bot_session, "meeting_url", None)
-        )
-        u.metadata = {
-            "bot_id": getattr(bot_session, "bot_id", None),
-            "embedding": e,
-            "meeting_link": ml,
-            "type": u.type,
-            "date": u.date,
-            "meeting_title": meeting_title,
-        }
+        u.metadata = {**base_meta, "embedding": e, "type": u.type}
 
     # Store in Supabase
     backend = (os.getenv("RAG_BACKEND") or "supabase").lower()
     if backend != "supabase":
         return {"ok": False, "reason": "backend-not-supabase", "hint": "Set RAG_BACKEND=supabase to use pgvector in Supabase."}
 
-    supa = RAGSupabase()
+    supa = _get_rag_store()
     inserted = supa.insert_units(user_id=user_id, units=units)
     return {"ok": True, "inserted": inserted, "units": len(units)}
 
 
-def answer_question_with_rag(*, question: str, user_id: str, filters: Optional[Dict[str, Any]] = None, top_k: int = 6, min_similarity: float = 0.65) -> Dict[str, Any]:
-    """Embed the question, retrieve contexts from Supabase, and answer via Groq.
+def _query_texts(question: str) -> List[str]:
+    """Texts to embed for a question: the question itself, plus (RAG_MQE=1) each
+    sub-question of a compound question like "What was decided? Who owns it?"."""
+    texts = [question]
+    if os.getenv("RAG_MQE", "0") == "1":
+        parts = [p.strip() + "?" for p in question.split("?") if p.strip()]
+        if len(parts) > 1:
+            texts.extend(parts)
+    return texts
 
-    Applies a similarity threshold; if no contexts pass, returns a fallback message.
-    """
-    embedder = LocalEmbedder()
-    q_emb = embedder.embed([question])[0]
-    supa = RAGSupabase()
-    rows = supa.match(user_id=user_id, query_embedding=q_emb, top_k=top_k, min_similarity=min_similarity, filters=filters)
 
-    # Fallback: try without additional filters if no match
-    if not rows:
-        rows = supa.match(user_id=user_id, query_embedding=q_emb, top_k=top_k, min_similarity=min_similarity, filters=None)
+def _embed_query(question: str) -> "np.ndarray":
+    """Query vector from one batched encode of all query texts (centroid when expanded)."""
+    vecs = _get_embedder().embed(_query_texts(question))
+    if len(vecs) == 1:
+        return vecs[0]
+    centroid = vecs.mean(axis=0)
+    norm = float(np.linalg.norm(centroid))
+    return centroid / norm if norm else vecs[0]
 
-    contexts: List[str] = []
+
+_NO_CONTEXT_ANSWER = "I do not have sufficient context from previous meetings."
+
+
+def _answer_prompt(question: str, rows: List[Dict[str, Any]]) -> Tuple[List[str], List[Dict[str, str]], int]:
+    """(contexts, chat messages, max_tokens) for answering from retrieved rows.
+
+    With no rows the LLM is still asked, but only to state that context is insufficient.
+    """
     if not rows:
-        # If LLM is configured, still make the call and ask it to state that context is insufficient.
-        try:
-            from groq import Groq  # type: ignore
-        except Exception:
-            Groq = None  # type: ignore
-        api_key = (os.getenv("GROQ_API_KEY") or "").strip()
-        model = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
-        if not api_key or Groq is None:
-            return {"ok": False, "answer": "I do not have sufficient context from previous meetings.", "contexts": []}
-        client = Groq(api_key=api_key)
         system = "You are a helpful assistant. If no prior meeting context is available, say so explicitly."
         user_msg = f"Question: {question}\n\nNo prior meeting context is available. Respond by stating that context is insufficient."
-        try:
-            resp = client.chat.completions.create(
-                model=model,
-                messages=[{"role": "system", "content": system}, {"role": "user", "content": user_msg}],
-                temperature=0.2,
-                max_tokens=200,
-            )
-            content = (resp.choices[0].message.content or "").strip()
-        except Exception:
-            content = "I do not have sufficient context from previous meetings."
-        return {"ok": False, "answer": content, "contexts": []}
+        return [], [{"role": "system", "content": system}, {"role": "user", "content": user_msg}], 200
     # Build context string
+    contexts: List[str] = []
     for r in rows:
         t = (r.get("text") or "").strip()
         md = r.get("metadata") or {}
@@ -364,26 +598,90 @@ def answer_question_with_rag(*, question: str, user_id: str, filters: Optional[D
         ttl = (md.get("meeting_title") or "").strip()
         ctx = f"[{typ or 'unit'}] {ttl}: {t}" if ttl else f"[{typ or 'unit'}] {t}"
         contexts.append(ctx)
+    system = "You are a helpful assistant. Answer the user's question using ONLY the provided prior meeting context. If the context is insufficient, say so explicitly."
+    ctx_block = "\n\n".join(contexts)
+    user_msg = f"Question: {question}\n\nPrior meeting context:\n{ctx_block}\n\nAnswer concisely and cite relevant points from the context."
+    return contexts, [{"role": "system", "content": system}, {"role": "user", "content": user_msg}], 800
+
+
+def _answer_without_llm(contexts: List[str]) -> Dict[str, Any]:
+    if contexts:
+        return {"ok": True, "answer": "Context found, but LLM is not configured.", "contexts": contexts}
+    return {"ok": False, "answer": _NO_CONTEXT_ANSWER, "contexts": []}
+
+
+def _retrieve(supa: RAGSupabase, q_emb: Union[str, List[float]], *, user_id: str, filters: Optional[Dict[str, Any]], top_k: int, min_similarity: float) -> List[Dict[str, Any]]:
+    global _match_fallback_rpc
+    if filters and _match_fallback_rpc:
+        # One round trip: the database falls back to unfiltered matches itself.
+        try:
+            return supa.match(user_id=user_id, query_embedding=q_emb, top_k=top_k, min_similarity=min_similarity, filters=filters, fallback_no_filter=True)
+        except Exception as e:
+            if not _is_missing_rpc(e):
+                raise
+            _match_fallback_rpc = False
+    rows = supa.match(user_id=user_id, query_embedding=q_emb, top_k=top_k, min_similarity=min_similarity, filters=filters)
+    # Fallback: try without additional filters if no match (identical call when unfiltered)
+    if not rows and filters:
+        rows = supa.match(user_id=user_id, query_embedding=q_emb, top_k=top_k, min_similarity=min_similarity, filters=None)
+    return rows
+
+
+def answer_question_with_rag(*, question: str, user_id: str, filters: Optional[Dict[str, Any]] = None, top_k: int = 6, min_similarity: float = 0.65) -> Dict[str, Any]:
+    """Embed the question, retrieve contexts from Supabase, and answer via Groq.
+
+    Applies a similarity threshold; if no contexts pass, returns a fallback message.
+    """
+    q_emb = _vector_param(_embed_query(question))
+    rows = _retrieve(_get_rag_store(), q_emb, user_id=user_id, filters=filters, top_k=top_k, min_similarity=min_similarity)
+    contexts, messages, max_tokens = _answer_prompt(question, rows)
 
-    # Call Groq with contexts
-    try:
-        from groq import Groq  # type: ignore
-    except Exception:
-        Groq = None  # type: ignore
     api_key = (os.getenv("GROQ_API_KEY") or "").strip()
     model = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
     if not api_key or Groq is None:
-        return {"ok": True, "answer": "Context found, but LLM is not configured.", "contexts": contexts}
-
+        return _answer_without_llm(contexts)
     client = Groq(api_key=api_key)
-    system = "You are a helpful assistant. Answer the user's question using ONLY the provided prior meeting context. If the context is insufficient, say so explicitly."
-    ctx_block = "\n\n".join(contexts)
-    user_msg = f"Question: {question}\n\nPrior meeting context:\n{ctx_block}\n\nAnswer concisely and cite relevant points from the context."
-    resp = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "system", "content": system}, {"role": "user", "content": user_msg}],
-        temperature=0.2,
-        max_tokens=800,
+    try:
+        resp = client.chat.completions.create(model=model, messages=messages, temperature=0.2, max_tokens=max_tokens)
+    except Exception:
+        if contexts:
+            raise
+        return {"ok": False, "answer": _NO_CONTEXT_ANSWER, "contexts": []}
+    content = (resp.choices[0].message.content or "").strip()
+    return {"ok": bool(contexts), "answer": content, "contexts": contexts}
+
+
+@functools.lru_cache(maxsize=4)
+def _async_groq(api_key: str) -> Any:
+    """Shared AsyncGroq client per API key (keeps its connection pool warm)."""
+    return AsyncGroq(api_key=api_key)
+
+
+async def answer_question_with_rag_async(*, question: str, user_id: str, filters: Optional[Dict[str, Any]] = None, top_k: int = 6, min_similarity: float = 0.65) -> Dict[str, Any]:
+    """answer_question_with_rag for async callers: same result, never blocks the event loop.
+
+    Embedding and the Supabase match RPCs run in worker threads; the Groq call is
+    awaited on a shared AsyncGroq client (or run in a thread on older groq SDKs).
+    """
+    q_emb = _vector_param(await asyncio.to_thread(_embed_query, question))
+    rows = await asyncio.to_thread(
+        _retrieve, _get_rag_store(), q_emb, user_id=user_id, filters=filters, top_k=top_k, min_similarity=min_similarity
     )
+    contexts, messages, max_tokens = _answer_prompt(question, rows)
+
+    api_key = (os.getenv("GROQ_API_KEY") or "").strip()
+    model = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+    if not api_key or Groq is None:
+        return _answer_without_llm(contexts)
+    kwargs = {"model": model, "messages": messages, "temperature": 0.2, "max_tokens": max_tokens}
+    try:
+        if AsyncGroq is not None:
+            resp = await _async_groq(api_key).chat.completions.create(**kwargs)
+        else:
+            resp = await asyncio.to_thread(Groq(api_key=api_key).chat.completions.create, **kwargs)
+    except Exception:
+        if contexts:
+            raise
+        return {"ok": False, "answer": _NO_CONTEXT_ANSWER, "contexts": []}
     content = (resp.choices[0].message.content or "").strip()
-    return {"ok": True, "answer": content, "contexts": contexts}
+    return {"ok": bool(contexts), "answer": content, "contexts": contexts}
@@ -1,26 +1,95 @@
 from __future__ import annotations
 
 import asyncio
+import itertools
+import re
 import time
-import uuid
+import secrets
+import sys
+from collections import deque
 from dataclasses import dataclass, field
 import os
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 import hmac
 import hashlib
-import json
-from datetime import datetime
+from datetime import datetime, timezone
 import httpx
+import orjson
 
-from ..supabase_integration import upsert_meeting as _sb_upsert
+from ..supabase_integration import queue_upsert_meeting as _sb_queue_upsert
 try:
     from groq import Groq  # type: ignore
 except Exception:
     Groq = None  # type: ignore
+try:
+    import ahocorasick  # type: ignore
+except Exception:
+    ahocorasick = None  # type: ignore
+
+# Per-session SSE frame ring shared by all subscribers; a client that falls further
+# behind than this misses the oldest frames.
+PER_CLIENT_MAX = int(os.getenv("SSE_SUBSCRIBER_QUEUE_MAX", "256") or 256)
+
+# Raw utterance dicts retained in memory per session; older ones are spilled to
+# data/transcripts/{bot_id}.jsonl as they are evicted (see AppState.utterance_spill).
+MAX_UTTERANCES = int(os.getenv("BOT_MAX_UTTERANCES", "5000") or 5000)
+
+# Max concurrent Groq summarizations (window and finalize).
+SUMMARIZE_CONCURRENCY = max(1, int(os.getenv("GROQ_SUMMARIZE_CONCURRENCY", "4") or 4))
+
+# Transcript lines per incremental Groq window summary while the meeting runs; the
+# finalize prompt then sees the window summaries plus only the unsummarized tail.
+# 0 disables windowing (finalize summarizes the full transcript).
+SUMMARY_WINDOW_LINES = max(0, int(os.getenv("GROQ_SUMMARY_WINDOW_LINES", "150") or 0))
+
+# Number of striped per-bot locks in AppState.
+LOCK_STRIPES = 64
+
+# A caption repeating the same speaker+text within this many seconds (by caption ts)
+# is a bot re-post; later repeats ("Yes.", "Okay") are real utterances.
+CAPTION_DEDUPE_SECONDS = float(os.getenv("CAPTION_DEDUPE_SECONDS", "5") or 5)
+# Hard cap on remembered caption fingerprints per session (memory bound).
+CAPTION_DEDUPE_WINDOW = int(os.getenv("CAPTION_DEDUPE_WINDOW", "256") or 256)
+
+# Planned-message trigger types matched against incoming captions.
+KEYWORD_TRIGGER_TYPES = frozenset({"keyword", "keywords", "keyword_cues"})
+
+# Sentence/line boundaries for _simple_summarize.
+_SENT_SPLIT_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+# dataclass(slots=True) is Python 3.10+; older interpreters keep per-instance __dict__s.
+_DC_SLOTS: Dict[str, Any] = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+# Events delivered to a webhook subscription that does not list its own.
+_DEFAULT_WEBHOOK_EVENTS = ("bot.state_changed", "transcript.update")
+
+
+# Finalize artifacts (transcripts/, summaries/) live under backend/data.
+_DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+
+
+def _write_finalize_files(tx_path: Path, text: str, sm_path: Path, content: str) -> None:
+    """Write the transcript and summary files, creating their directories (blocking)."""
+    if text:
+        tx_path.parent.mkdir(parents=True, exist_ok=True)
+        tx_path.write_bytes(text.encode("utf-8"))
+    if content:
+        sm_path.parent.mkdir(parents=True, exist_ok=True)
+        sm_path.write_bytes(content.encode("utf-8"))
 
 
-@dataclass
+def _iso_utc(ts: float) -> str:
+    """UTC ISO-8601 with a Z suffix, e.g. 2024-01-01T12:00:00.123456Z."""
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat() + "Z"
+
+
+def _sse_frame(event: bytes, data: Any) -> bytes:
+    """Encode one server-sent-events frame."""
+    return b"event: " + event + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+@dataclass(**_DC_SLOTS)
 class BotSession:
     bot_id: str
     event_id: str
@@ -31,27 +100,322 @@ class BotSession:
     state: str = "scheduled"  # scheduled|running|ended|error
     created_at: float = field(default_factory=lambda: time.time())
     updated_at: float = field(default_factory=lambda: time.time())
-    # transcript utterances as dicts (frontend-compatible)
-    utterances: List[Dict[str, Any]] = field(default_factory=list)
-    # live subscribers
-    subscribers: List[asyncio.Queue] = field(default_factory=list)
+    # most recent transcript utterances as dicts (frontend-compatible), capped at
+    # MAX_UTTERANCES; the full transcript text lives in transcript_lines
+    utterances: Deque[Dict[str, Any]] = field(default_factory=lambda: deque(maxlen=MAX_UTTERANCES))
+    # evicted utterances, oldest first, one JSON line each in the spill file
+    spilled: int = 0
+    spill_file: Optional[Any] = None
+    # "speaker: text" line per non-empty utterance, formatted once at append time
+    transcript_lines: List[str] = field(default_factory=list)
+    # SSE broadcast: the last PER_CLIENT_MAX pre-encoded frames, the sequence number
+    # of the newest one, and an event set (and replaced) on every append. Only filled while
+    # sse_subscribers > 0; readers track their own position (see SseSubscription).
+    sse_ring: deque = field(default_factory=lambda: deque(maxlen=PER_CLIENT_MAX))
+    sse_seq: int = 0
+    sse_event: asyncio.Event = field(default_factory=asyncio.Event)
+    sse_subscribers: int = 0
     # finalized summary for quick access
     summary_text: str = ""
+    # Groq summaries of consecutive transcript_lines windows, in order; they cover
+    # transcript_lines[:covered_lines]. summarized_lines is where the next window
+    # starts (it runs ahead of covered_lines while window_task is in flight).
+    partial_summaries: List[str] = field(default_factory=list)
+    summarized_lines: int = 0
+    covered_lines: int = 0
+    window_task: Optional[asyncio.Task] = None
+    windowing_failed: bool = False
+    # fingerprints of recent captions: (ts, digest) in arrival order for eviction,
+    # digest -> caption ts for lookup
+    recent_caption_order: deque = field(default_factory=deque)
+    recent_caption_ts: Dict[bytes, float] = field(default_factory=dict)
+
+
+class CommandMailbox:
+    """Bounded FIFO of commands for one bot, drained by its long-poll requests.
+
+    A deque plus one asyncio.Event: put() is a plain append, and an idle poll costs a
+    single event wait instead of asyncio.Queue's per-getter future bookkeeping.
+    """
+
+    __slots__ = ("_items", "_maxlen", "_ready")
+
+    def __init__(self, maxlen: int = 200) -> None:
+        self._items: Deque[Dict[str, Any]] = deque()
+        self._maxlen = maxlen
+        self._ready = asyncio.Event()
+
+    def put(self, cmd: Dict[str, Any]) -> bool:
+        """Append cmd; False (command dropped) if the mailbox is full."""
+        if len(self._items) >= self._maxlen:
+            return False
+        self._items.append(cmd)
+        self._ready.set()
+        return True
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Oldest command, waiting up to timeout seconds; None if none arrived."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not self._items:
+            # Cleared only while empty, so a put() after this always wakes the wait
+            self._ready.clear()
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            try:
+                await asyncio.wait_for(self._ready.wait(), remaining)
+            except asyncio.TimeoutError:
+                return None
+        return self._items.popleft()
+
+
+class SseSubscription:
+    """One SSE reader's cursor over its session's shared frame ring."""
+
+    __slots__ = ("session", "seq")
+
+    def __init__(self, session: BotSession) -> None:
+        self.session = session
+        self.seq = session.sse_seq
+
+    def pending(self) -> int:
+        return self.session.sse_seq - self.seq
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait until a frame newer than the cursor exists; False on timeout."""
+        s = self.session
+        if s.sse_seq != self.seq:
+            return True
+        # Bind the current event now: a publish between here and the inner task
+        # starting still sets it, because publishers replace rather than clear it.
+        ev = s.sse_event
+        try:
+            await asyncio.wait_for(ev.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def drain(self) -> List[bytes]:
+        """Frames published since the last drain (at most the ring's length)."""
+        s = self.session
+        n = min(s.sse_seq - self.seq, len(s.sse_ring))
+        self.seq = s.sse_seq
+        if n <= 0:
+            return []
+        return list(itertools.islice(s.sse_ring, len(s.sse_ring) - n, None))
+
+
+@dataclass(**_DC_SLOTS)
+class _SessionSnap:
+    """Session fields read once under the lock at the start of finalization."""
+    title: str
+    meet_link: str
+    user_id: str
+    event_id: str
+    start_time: str
+    transcript_text: str
+    # Window summaries and the transcript after them; () / "" when there are none.
+    partial_summaries: Tuple[str, ...]
+    unsummarized_text: str
 
 
 class AppState:
+    __slots__ = (
+        "_locks",
+        "_dir_lock",
+        "_summarize_sem",
+        "by_bot_id",
+        "_sessions",
+        "by_meet_link",
+        "planned_messages",
+        "_pm_by_session",
+        "_pm_by_event",
+        "_pm_by_link",
+        "_pm_by_keyword",
+        "_pm_version",
+        "_pm_snapshot",
+        "_pm_snapshot_version",
+        "_kw_automaton",
+        "_kw_automaton_dirty",
+        "command_queues",
+        "webhooks",
+        "_wh_idx",
+        "_http",
+    )
+
     def __init__(self) -> None:
-        self._lock = asyncio.Lock()
+        # Per-bot state is guarded by one of LOCK_STRIPES locks picked by bot_id, so
+        # unrelated bots never wait on each other; _dir_lock covers the cross-bot
+        # directory dicts (by_bot_id / by_meet_link / command_queues) on create/cleanup.
+        self._locks = tuple(asyncio.Lock() for _ in range(LOCK_STRIPES))
+        self._dir_lock = asyncio.Lock()
+        # Caps concurrent Groq summarizations (each runs in a worker thread).
+        self._summarize_sem = asyncio.Semaphore(SUMMARIZE_CONCURRENCY)
         self.by_bot_id: Dict[str, BotSession] = {}
+        # Copy-on-write tuple of all sessions for lock-free iteration by readers.
+        self._sessions: Tuple[BotSession, ...] = ()
         self.by_meet_link: Dict[str, str] = {}
         self.planned_messages: Dict[str, Dict[str, Any]] = {}  # pm_id -> payload
-        self.command_queues: Dict[str, asyncio.Queue] = {}  # bot_id -> queue of dict commands
+        # Secondary indexes over planned_messages, maintained by put/pop_planned_message.
+        # (event_id, meet_link) -> pm_ids; "" in either slot means "any".
+        self._pm_by_session: Dict[Tuple[str, str], Set[str]] = {}
+        # event_id -> pm_ids and meet_link -> pm_ids (non-empty values only), for list
+        # filters; dicts used as insertion-ordered sets so results keep creation order.
+        self._pm_by_event: Dict[str, Dict[str, None]] = {}
+        self._pm_by_link: Dict[str, Dict[str, None]] = {}
+        # normalized keyword -> pm_ids (keyword-triggered messages only)
+        self._pm_by_keyword: Dict[str, Set[str]] = {}
+        # Immutable (pm_id, payload) view of planned_messages, rebuilt only after writes.
+        self._pm_version = 0
+        self._pm_snapshot: Tuple[Tuple[str, Dict[str, Any]], ...] = ()
+        self._pm_snapshot_version = 0
+        # Aho-Corasick automaton over _pm_by_keyword keys; rebuilt lazily after changes.
+        self._kw_automaton: Any = None
+        self._kw_automaton_dirty = False
+        self.command_queues: Dict[str, CommandMailbox] = {}  # bot_id -> pending dict commands
         # Webhook subscriptions per bot_id: List[{url, events, secret}]
         self.webhooks: Dict[str, List[Dict[str, Any]]] = {}
+        # Same subscriptions indexed by (bot_id, event type), so dispatch only sees matches.
+        self._wh_idx: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        # Long-lived client for webhook delivery (keep-alive across events); see _webhook_client.
+        self._http: Optional[httpx.AsyncClient] = None
+
+    def _lk(self, bot_id: str) -> asyncio.Lock:
+        return self._locks[hash(bot_id) % LOCK_STRIPES]
+
+    @staticmethod
+    def _pm_session_key(pm: Dict[str, Any]) -> Tuple[str, str]:
+        return ((pm.get("event_id") or "").strip(), (pm.get("meet_link") or "").strip())
+
+    @staticmethod
+    def _pm_keywords(pm: Dict[str, Any]) -> List[str]:
+        """Normalized keywords for a keyword-triggered planned message, in declared order."""
+        if (pm.get("trigger_type") or "").strip().lower() not in KEYWORD_TRIGGER_TYPES:
+            return []
+        keywords = pm.get("keywords") or []
+        if not isinstance(keywords, list):
+            return []
+        return [k for k in ((kw or "").strip().lower() for kw in keywords) if k]
+
+    def put_planned_message(self, pm: Dict[str, Any]) -> None:
+        """Store a planned message (keyed by pm["id"]) and index it."""
+        pm_id = pm["id"]
+        self.pop_planned_message(pm_id)
+        self.planned_messages[pm_id] = pm
+        self._pm_version += 1
+        event_id, meet_link = key = self._pm_session_key(pm)
+        self._pm_by_session.setdefault(key, set()).add(pm_id)
+        if event_id:
+            self._pm_by_event.setdefault(event_id, {})[pm_id] = None
+        if meet_link:
+            self._pm_by_link.setdefault(meet_link, {})[pm_id] = None
+        for kw in self._pm_keywords(pm):
+            self._pm_by_keyword.setdefault(kw, set()).add(pm_id)
+            self._kw_automaton_dirty = True
+
+    def pop_planned_message(self, pm_id: str) -> Optional[Dict[str, Any]]:
+        """Remove a planned message and drop it from the indexes."""
+        pm = self.planned_messages.pop(pm_id, None)
+        if pm is None:
+            return None
+        self._pm_version += 1
+        key = self._pm_session_key(pm)
+        ids = self._pm_by_session.get(key)
+        if ids is not None:
+            ids.discard(pm_id)
+            if not ids:
+                del self._pm_by_session[key]
+        for index, value in ((self._pm_by_event, key[0]), (self._pm_by_link, key[1])):
+            ordered = index.get(value) if value else None
+            if ordered is not None:
+                ordered.pop(pm_id, None)
+                if not ordered:
+                    del index[value]
+        for kw in self._pm_keywords(pm):
+            ids = self._pm_by_keyword.get(kw)
+            if ids is not None:
+                ids.discard(pm_id)
+                if not ids:
+                    del self._pm_by_keyword[kw]
+                    self._kw_automaton_dirty = True
+        return pm
+
+    @property
+    def has_keyword_triggers(self) -> bool:
+        return bool(self._pm_by_keyword)
+
+    def _keyword_hits(self, text_lower: str) -> Set[str]:
+        """Indexed keywords occurring as substrings of text_lower (single scan when pyahocorasick is available)."""
+        if not self._pm_by_keyword:
+            return set()
+        if ahocorasick is None:
+            return {kw for kw in self._pm_by_keyword if kw in text_lower}
+        if self._kw_automaton is None or self._kw_automaton_dirty:
+            auto = ahocorasick.Automaton()
+            for kw in self._pm_by_keyword:
+                auto.add_word(kw, kw)
+            auto.make_automaton()
+            self._kw_automaton = auto
+            self._kw_automaton_dirty = False
+        return {kw for _, kw in self._kw_automaton.iter(text_lower)}
+
+    def planned_messages_snapshot(self) -> Tuple[Tuple[str, Dict[str, Any]], ...]:
+        """Stable (pm_id, payload) tuple for iteration; shared until the next put/pop."""
+        if self._pm_snapshot_version != self._pm_version:
+            self._pm_snapshot = tuple(self.planned_messages.items())
+            self._pm_snapshot_version = self._pm_version
+        return self._pm_snapshot
+
+    def planned_ids_for_session(self, event_id: str, meet_link: str) -> Set[str]:
+        """pm_ids whose event_id/meet_link are empty or equal to the given session's."""
+        out: Set[str] = set()
+        for key in {(event_id, meet_link), (event_id, ""), ("", meet_link), ("", "")}:
+            ids = self._pm_by_session.get(key)
+            if ids:
+                out |= ids
+        return out
+
+    def planned_messages_filtered(self, event_id: str = "", meet_link: str = "") -> List[Dict[str, Any]]:
+        """Planned messages whose event_id and/or meet_link equal the given (non-empty) filters."""
+        if not event_id and not meet_link:
+            return [pm for _, pm in self.planned_messages_snapshot()]
+        by_event = self._pm_by_event.get(event_id) or {} if event_id else None
+        by_link = self._pm_by_link.get(meet_link) or {} if meet_link else None
+        if by_event is not None and by_link is not None:
+            # Walk the smaller index, probe the other; keeps creation order.
+            small, large = (by_event, by_link) if len(by_event) <= len(by_link) else (by_link, by_event)
+            ids: Iterable[str] = [pm_id for pm_id in small if pm_id in large]
+        else:
+            ids = by_event if by_event is not None else by_link  # type: ignore[assignment]
+        return [self.planned_messages[pm_id] for pm_id in ids]
+
+    def match_keyword_planned_messages(self, text_lower: str, *, event_id: str, meet_link: str) -> List[Tuple[str, str]]:
+        """Return (pm_id, matched_keyword) for keyword-triggered messages hit by a caption.
+
+        The caption is scanned once against all distinct keywords; the matched
+        keyword is the first one in the message's own keyword order.
+        """
+        hits = self._keyword_hits(text_lower)
+        if not hits:
+            return []
+        hit_ids: Set[str] = set()
+        for kw in hits:
+            hit_ids |= self._pm_by_keyword[kw]
+        hit_ids &= self.planned_ids_for_session(event_id, meet_link)
+        out: List[Tuple[str, str]] = []
+        for pm_id in hit_ids:
+            pm = self.planned_messages.get(pm_id)
+            if not pm:
+                continue
+            matched = next((k for k in self._pm_keywords(pm) if k in hits), None)
+            if matched:
+                out.append((pm_id, matched))
+        return out
 
     async def create_bot(self, *, event_id: str, meet_link: str, title: str = "", start_time: str = "", user_id: Optional[str] = None) -> BotSession:
-        async with self._lock:
-            bot_id = f"bot_{uuid.uuid4().hex[:12]}"
+        async with self._dir_lock:
+            bot_id = f"bot_{secrets.token_hex(6)}"
             # Associate a Supabase user for meeting records (required by schema)
             sb_user_id = (user_id or os.getenv("SUPABASE_USER_ID", "").strip())
             session = BotSession(
@@ -63,57 +427,100 @@ class AppState:
                 start_time=start_time or "",
             )
             self.by_bot_id[bot_id] = session
+            self._sessions = self._sessions + (session,)
             if meet_link:
                 self.by_meet_link[meet_link] = bot_id
-            self.command_queues[bot_id] = asyncio.Queue(maxsize=200)
+            self.command_queues[bot_id] = CommandMailbox(maxlen=200)
             self.webhooks[bot_id] = []
             return session
 
+    def sessions_snapshot(self) -> Tuple[BotSession, ...]:
+        """All sessions as an immutable tuple; replaced (not mutated) when a bot is created."""
+        return self._sessions
+
     async def get_bot(self, bot_id: str) -> Optional[BotSession]:
-        async with self._lock:
+        async with self._lk(bot_id):
             return self.by_bot_id.get(bot_id)
 
     async def enqueue_command(self, bot_id: str, cmd: Dict[str, Any]) -> bool:
-        async with self._lock:
+        async with self._lk(bot_id):
             q = self.command_queues.get(bot_id)
-            if not q:
-                return False
-            try:
-                q.put_nowait(cmd)
-                return True
-            except Exception:
+            if q is None:
                 return False
+            return q.put(cmd)
 
-    async def get_command_queue(self, bot_id: str) -> Optional[asyncio.Queue]:
-        async with self._lock:
+    async def get_command_queue(self, bot_id: str) -> Optional[CommandMailbox]:
+        async with self._lk(bot_id):
             return self.command_queues.get(bot_id)
 
     async def cleanup_bot(self, bot_id: str) -> None:
-        async with self._lock:
+        async with self._dir_lock:
             self.command_queues.pop(bot_id, None)
+        async with self._lk(bot_id):
+            s = self.by_bot_id.get(bot_id)
+            if s is not None and s.spill_file is not None:
+                f, s.spill_file = s.spill_file, None
+                try:
+                    f.close()
+                except Exception:
+                    pass
+
+    @staticmethod
+    def _spill_path(bot_id: str) -> Path:
+        return _DATA_DIR / "transcripts" / f"{bot_id}.jsonl"
+
+    def _spill_utterance(self, s: BotSession, utterance: Dict[str, Any]) -> None:
+        """Append an utterance about to be evicted from s.utterances to the spill file.
+
+        Buffered and never fsynced, so it stays cheap enough for the caller's lock.
+        """
+        try:
+            if s.spill_file is None:
+                path = self._spill_path(s.bot_id)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                # A fresh session starts a fresh file; reopen after cleanup appends.
+                s.spill_file = path.open("ab" if s.spilled else "wb")
+            s.spill_file.write(orjson.dumps(utterance) + b"\n")
+            s.spilled += 1
+        except Exception as e:
+            print(f"[state] utterance spill failed for bot_id={s.bot_id}: {e}")
+
+    def utterance_spill(self, s: BotSession) -> Tuple[Optional[Path], int]:
+        """(spill file path, number of utterances in it) for a consistent read.
+
+        The first `count` lines of the file are exactly the utterances evicted before
+        s.utterances' current contents; call with no await before snapshotting those.
+        """
+        if not s.spilled:
+            return None, 0
+        if s.spill_file is not None:
+            try:
+                s.spill_file.flush()
+            except Exception:
+                pass
+        return self._spill_path(s.bot_id), s.spilled
 
     async def get_bot_id_for_link(self, meet_link: str) -> Optional[str]:
-        async with self._lock:
+        async with self._dir_lock:
             return self.by_meet_link.get(meet_link)
 
     async def set_state(self, bot_id: str, state: str) -> None:
         # Update state and capture webhook targets
         subs: List[Dict[str, Any]] = []
-        async with self._lock:
+        async with self._lk(bot_id):
             s = self.by_bot_id.get(bot_id)
             if not s:
                 return
             s.state = state
-            s.updated_at = time.time()
-            subs = list(self.webhooks.get(bot_id, []))
+            s.updated_at = now = time.time()
+            subs = tuple(self._wh_idx.get((bot_id, "bot.state_changed"), ()))
             payload = {
                 "type": "bot.state_changed",
                 "bot_id": s.bot_id,
                 "event_id": s.event_id,
                 "meet_link": s.meet_link,
                 "state": s.state,
-                "time": time.time(),
-                "time_iso": datetime.utcnow().isoformat() + "Z",
+                "time": now,
             }
         # Dispatch outside the lock
         await self._dispatch_webhooks(subs, payload)
@@ -125,87 +532,190 @@ class AppState:
         except Exception:
             pass
 
+    def is_duplicate_caption(self, bot_id: str, speaker: str, text: str, ts: float) -> bool:
+        """Return True if this speaker/text pair was seen within CAPTION_DEDUPE_SECONDS of `ts`.
+
+        Otherwise remember it (bounded by CAPTION_DEDUPE_WINDOW) and return False.
+        Synchronous and await-free, so it is atomic on the event loop.
+        """
+        s = self.by_bot_id.get(bot_id)
+        if s is None or CAPTION_DEDUPE_WINDOW <= 0 or CAPTION_DEDUPE_SECONDS <= 0:
+            return False
+        order, seen = s.recent_caption_order, s.recent_caption_ts
+        cutoff = ts - CAPTION_DEDUPE_SECONDS
+        while order and (order[0][0] < cutoff or len(order) >= CAPTION_DEDUPE_WINDOW):
+            old_ts, old_h = order.popleft()
+            if seen.get(old_h) == old_ts:
+                del seen[old_h]
+        h = hashlib.blake2b(f"{speaker}\x00{text}".encode("utf-8"), digest_size=8).digest()
+        prev = seen.get(h)
+        if prev is not None and abs(ts - prev) <= CAPTION_DEDUPE_SECONDS:
+            return True
+        seen[h] = ts
+        order.append((ts, h))
+        return False
+
     async def add_utterance(self, bot_id: str, utterance: Dict[str, Any]) -> None:
-        subs: List[Dict[str, Any]] = []
-        async with self._lock:
+        async with self._lk(bot_id):
             s = self.by_bot_id.get(bot_id)
             if not s:
                 return
+            if len(s.utterances) == s.utterances.maxlen:
+                self._spill_utterance(s, s.utterances[0])
             s.utterances.append(utterance)
-            s.updated_at = time.time()
-            subs = list(self.webhooks.get(bot_id, []))
-            # fanout to SSE subscribers
-            for q in list(s.subscribers):
-                try:
-                    q.put_nowait(utterance)
-                except Exception:
-                    pass
+            line = self._transcript_line(utterance)
+            if line:
+                s.transcript_lines.append(line)
+                self._maybe_start_window(s)
+            s.updated_at = now = time.time()
+            # Snapshots only; all delivery happens after the lock is released.
+            has_readers = s.sse_subscribers > 0
+            subs = tuple(self._wh_idx.get((bot_id, "transcript.update"), ()))
             payload = {
                 "type": "transcript.update",
                 "bot_id": s.bot_id,
                 "event_id": s.event_id,
                 "meet_link": s.meet_link,
                 "utterance": utterance,
-                "time": time.time(),
-                "time_iso": datetime.utcnow().isoformat() + "Z",
+                "time": now,
             }
+        # SSE broadcast outside the lock: one frame into the shared ring, then one
+        # wake-up for every waiting reader. Await-free, so atomic on the event loop.
+        if has_readers:
+            s.sse_ring.append(_sse_frame(b"utterance", utterance))
+            s.sse_seq += 1
+            ev, s.sse_event = s.sse_event, asyncio.Event()
+            ev.set()
         await self._dispatch_webhooks(subs, payload)
 
     async def add_webhook(self, bot_id: str, sub: Dict[str, Any]) -> bool:
-        async with self._lock:
+        async with self._lk(bot_id):
             if bot_id not in self.by_bot_id:
                 return False
             lst = self.webhooks.setdefault(bot_id, [])
             lst.append(sub)
+            for ev in dict.fromkeys(sub.get("events") or _DEFAULT_WEBHOOK_EVENTS):
+                self._wh_idx.setdefault((bot_id, ev), []).append(sub)
             return True
 
     async def list_webhooks(self, bot_id: str) -> List[Dict[str, Any]]:
-        async with self._lock:
+        async with self._lk(bot_id):
             return list(self.webhooks.get(bot_id, []))
 
-    async def _dispatch_webhooks(self, subs: List[Dict[str, Any]], payload: Dict[str, Any]) -> None:
+    def _webhook_client(self) -> httpx.AsyncClient:
+        # Created on first use (no await in between, so no lock needed); closed by aclose().
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                timeout=httpx.Timeout(5.0),
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+                http2=True,
+            )
+        return self._http
+
+    async def aclose(self) -> None:
+        """Release pooled outbound connections (call on app shutdown)."""
+        client, self._http = self._http, None
+        if client is not None:
+            await client.aclose()
+
+    async def _dispatch_webhooks(self, subs: Sequence[Dict[str, Any]], payload: Dict[str, Any]) -> None:
+        """POST payload to subs, which must already be filtered to payload["type"]."""
         if not subs:
             return
-        body = json.dumps(payload, ensure_ascii=False)
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            tasks = []
-            for sub in subs:
-                events = (sub.get("events") or ["bot.state_changed", "transcript.update"])  # type: ignore
-                if payload.get("type") not in events:
-                    continue
-                url = sub.get("url")
-                if not url:
-                    continue
-                headers = {"Content-Type": "application/json"}
-                secret = sub.get("secret")
-                if secret:
-                    sig = hmac.new(str(secret).encode("utf-8"), body.encode("utf-8"), hashlib.sha256).hexdigest()
-                    headers["X-Webhook-Signature"] = sig
-                tasks.append(client.post(url, data=body.encode("utf-8"), headers=headers))
-            # Fire-and-forget; ignore individual failures
-            try:
-                if tasks:
-                    await asyncio.gather(*tasks, return_exceptions=True)
-            except Exception:
-                pass
+        # ISO form of "time" is only formatted when someone is subscribed
+        if "time" in payload and "time_iso" not in payload:
+            payload["time_iso"] = _iso_utc(payload["time"])
+        # One encode and one HMAC per distinct secret, however many subscribers share it
+        body_bytes = orjson.dumps(payload)
+        base_headers = {"Content-Type": "application/json"}
+        sig_cache: Dict[bytes, Dict[str, str]] = {}
+        client = self._webhook_client()
+        tasks = []
+        for sub in subs:
+            url = sub.get("url")
+            if not url:
+                continue
+            headers = base_headers
+            secret = sub.get("secret")
+            if secret:
+                secret_b = str(secret).encode("utf-8")
+                headers = sig_cache.get(secret_b)  # type: ignore[assignment]
+                if headers is None:
+                    sig = hmac.new(secret_b, body_bytes, hashlib.sha256).hexdigest()
+                    headers = sig_cache[secret_b] = {**base_headers, "X-Webhook-Signature": sig}
+            tasks.append(client.post(url, content=body_bytes, headers=headers))
+        # Fire-and-forget; ignore individual failures
+        try:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except Exception:
+            pass
 
     @staticmethod
-    def _build_transcript_text(items: List[Dict[str, Any]]) -> str:
-        lines: List[str] = []
-        for it in items or []:
-            try:
-                speaker = str((it or {}).get("speaker") or (it or {}).get("from") or "").strip()
-                text = str((it or {}).get("text") or (it or {}).get("content") or "").strip()
-            except Exception:
-                speaker = ""
-                text = ""
+    def _transcript_line(it: Optional[Dict[str, Any]]) -> str:
+        """Transcript line for one utterance: "speaker: text", or just the text; "" if empty."""
+        if not it:
+            return ""
+        try:
+            text = str(it.get("text") or it.get("content") or "").strip()
             if not text:
-                continue
-            if speaker:
-                lines.append(f"{speaker}: {text}")
+                return ""
+            speaker = str(it.get("speaker") or it.get("from") or "").strip()
+        except Exception:
+            return ""
+        return speaker + ": " + text if speaker else text
+
+    @staticmethod
+    def _iter_transcript_lines(items: Iterable[Dict[str, Any]]) -> Iterator[str]:
+        """Yield one "speaker: text" line per non-empty utterance.
+
+        Live sessions already hold these in BotSession.transcript_lines; this is for
+        utterance lists from elsewhere.
+        """
+        for it in items or []:
+            line = AppState._transcript_line(it)
+            if line:
+                yield line
+
+    @staticmethod
+    def _build_transcript_text(items: Iterable[Dict[str, Any]]) -> str:
+        return "\n".join(AppState._iter_transcript_lines(items))
+
+    def _maybe_start_window(self, s: BotSession) -> None:
+        """Start a background Groq summary of the next full window of lines (caller holds the lock)."""
+        if (
+            not SUMMARY_WINDOW_LINES
+            or len(s.transcript_lines) - s.summarized_lines < SUMMARY_WINDOW_LINES
+            or s.window_task is not None
+            or s.windowing_failed
+            or s.state == "ended"
+            or Groq is None
+            or not os.getenv("GROQ_API_KEY", "").strip()
+        ):
+            return
+        start = s.summarized_lines
+        end = start + SUMMARY_WINDOW_LINES
+        s.summarized_lines = end
+        s.window_task = asyncio.create_task(self._summarize_window(s, start, end))
+
+    async def _summarize_window(self, s: BotSession, start: int, end: int) -> None:
+        text = "\n".join(s.transcript_lines[start:end])
+        try:
+            async with self._summarize_sem:
+                part = await asyncio.to_thread(self._groq_summarize_window, text, s.title)
+        except Exception:
+            part = ""
+        async with self._lk(s.bot_id):
+            s.window_task = None
+            if part:
+                s.partial_summaries.append(part)
+                s.covered_lines = end
+                # Catch up if more than a window arrived meanwhile
+                self._maybe_start_window(s)
             else:
-                lines.append(text)
-        return "\n".join(lines)
+                # Leave these lines to the finalize prompt and stop windowing this session
+                s.summarized_lines = start
+                s.windowing_failed = True
 
     @staticmethod
     def _simple_summarize(text: str, max_lines: int = 8) -> str:
@@ -213,13 +723,20 @@ class AppState:
         s = (text or "").strip()
         if not s:
             return ""
-        import re
-        parts = [p.strip() for p in re.split(r"(?<=[.!?])\s+|\n+", s) if p.strip()]
-        return "\n".join(parts[:max_lines])
+        # Scan boundaries lazily: only the first max_lines parts are ever needed
+        def _pieces() -> Iterator[str]:
+            pos = 0
+            for m in _SENT_SPLIT_RE.finditer(s):
+                yield s[pos:m.start()]
+                pos = m.end()
+            yield s[pos:]
+
+        parts = (p for p in map(str.strip, _pieces()) if p)
+        return "\n".join(itertools.islice(parts, max_lines))
 
     @staticmethod
-    def _groq_summarize(text: str, title: str = "") -> str:
-        """Generate a structured meeting summary using Groq."""
+    def _groq_summarize_window(text: str, title: str = "") -> str:
+        """Condense one transcript window into notes for the finalize prompt (Groq)."""
         api_key = os.getenv("GROQ_API_KEY", "").strip()
         if not api_key or Groq is None:
             return ""
@@ -228,6 +745,44 @@ class AppState:
         if not s:
             return ""
 
+        try:
+            client = Groq(api_key=api_key)
+            resp = client.chat.completions.create(
+                model=os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"),
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You condense part of a meeting transcript into factual notes. "
+                        "Do NOT invent information. Keep speaker names, decisions, action items "
+                        "(with owners and deadlines) and open questions.",
+                    },
+                    {"role": "user", "content": f"Meeting Title: {title}\n\nTranscript excerpt:\n{s}\n\nNotes as bullet points:"},
+                ],
+                temperature=0.2,
+                max_tokens=500,
+            )
+            return (resp.choices[0].message.content or "").strip()
+        except Exception:
+            return ""
+
+    @staticmethod
+    def _groq_summarize(text: str, title: str = "", partials: Sequence[str] = ()) -> str:
+        """Generate a structured meeting summary using Groq.
+
+        partials are window notes for the start of the meeting; text is then only the
+        transcript that follows them.
+        """
+        api_key = os.getenv("GROQ_API_KEY", "").strip()
+        if not api_key or Groq is None:
+            return ""
+
+        s = (text or "").strip()
+        if partials:
+            notes = "\n\n".join(partials)
+            s = f"Notes on earlier parts of the meeting, in order:\n{notes}\n\nRemaining transcript:\n{s or '(none)'}"
+        if not s:
+            return ""
+
         try:
             client = Groq(api_key=api_key)
 
@@ -293,19 +848,44 @@ Be structured and clear.
             return ""
 
     async def _finalize_session(self, bot_id: str) -> None:
-        # Gather session context
-        async with self._lock:
+        # Let an in-flight window summary land so the snapshot below includes it. A
+        # window started after this wait is not covered yet; the snapshot uses
+        # covered_lines, so its lines stay in the unsummarized tail.
+        s = self.by_bot_id.get(bot_id)
+        if s is not None and s.window_task is not None:
+            await asyncio.wait((s.window_task,))
+        # Snapshot everything finalization needs in one critical section
+        async with self._lk(bot_id):
             s = self.by_bot_id.get(bot_id)
             if not s:
                 return
-            items = list(s.utterances)
-            title = s.title
-            meet_link = s.meet_link
-
-        # Build transcript and summary
-        text = self._build_transcript_text(items)
-        # Prefer Groq when available; fall back to simple summary
-        summary = self._groq_summarize(text, title=title) or self._simple_summarize(text)
+            # Lines were formatted as utterances arrived; only the join remains.
+            snap = _SessionSnap(
+                title=s.title,
+                meet_link=s.meet_link,
+                user_id=s.user_id,
+                event_id=s.event_id,
+                start_time=s.start_time,
+                transcript_text="\n".join(s.transcript_lines),
+                partial_summaries=tuple(s.partial_summaries),
+                unsummarized_text="\n".join(s.transcript_lines[s.covered_lines:]) if s.partial_summaries else "",
+            )
+        text = snap.transcript_text
+        title = snap.title
+        meet_link = snap.meet_link
+
+        # Build summary
+        # Prefer Groq when available; fall back to simple summary. The Groq SDK call
+        # blocks for seconds, so it runs in a worker thread with bounded concurrency.
+        # With window summaries, only they and the trailing lines go into the prompt.
+        async with self._summarize_sem:
+            if snap.partial_summaries:
+                summary = await asyncio.to_thread(
+                    self._groq_summarize, snap.unsummarized_text, title, snap.partial_summaries
+                )
+            else:
+                summary = await asyncio.to_thread(self._groq_summarize, text, title)
+        summary = summary or self._simple_summarize(text)
         # Fallback: if no transcript was captured, provide a minimal summary
         if not summary:
             fallback_bits: List[str] = ["No transcript was captured."]
@@ -320,32 +900,27 @@ Be structured and clear.
                 pass
             summary = "\n".join(fallback_bits)
 
-        # Persist artifacts under bot/backend/data
+        # Persist artifacts under bot/backend/data (one worker-thread hop for all file I/O)
         try:
-            base_dir = Path(__file__).resolve().parents[1] / "data"
-            tx_dir = base_dir / "transcripts"
-            sm_dir = base_dir / "summaries"
-            tx_dir.mkdir(parents=True, exist_ok=True)
-            sm_dir.mkdir(parents=True, exist_ok=True)
-            tx_path = tx_dir / f"{bot_id}.txt"
-            sm_path = sm_dir / f"{bot_id}.txt"
-            if text:
-                tx_path.write_text(text, encoding="utf-8")
-            if summary:
-                content = summary
-                if title and not content.startswith(title):
-                    content = f"{title}\n\n" + content
-                sm_path.write_text(content, encoding="utf-8")
+            content = summary
+            if title and not content.startswith(title):
+                content = f"{title}\n\n" + content
+            await asyncio.to_thread(
+                _write_finalize_files,
+                _DATA_DIR / "transcripts" / f"{bot_id}.txt",
+                text,
+                _DATA_DIR / "summaries" / f"{bot_id}.txt",
+                content,
+            )
         except Exception:
             pass
 
         # Update in-memory summary and notify subscribers via webhook
         subs: List[Dict[str, Any]] = []
-        async with self._lock:
-            s = self.by_bot_id.get(bot_id)
-            if s:
+        async with self._lk(bot_id):
+            if self.by_bot_id.get(bot_id) is s:
                 s.summary_text = summary or ""
-                subs = list(self.webhooks.get(bot_id, []))
+                subs = list(self._wh_idx.get((bot_id, "meeting.summary.ready"), ()))
         payload = {
             "type": "meeting.summary.ready",
             "bot_id": bot_id,
@@ -354,58 +929,57 @@ Be structured and clear.
         }
         await self._dispatch_webhooks(subs, payload)
 
-        # Persist meeting details to Supabase (best-effort)
+        # Persist meeting details to Supabase (best-effort, batched by the write flusher)
         try:
-            sb_user_id = s.user_id if s else ""
-            ok = _sb_upsert(
-                user_id=sb_user_id,
-                event_id=s.event_id if s else "",
+            _sb_queue_upsert(
+                user_id=snap.user_id or "",
+                event_id=snap.event_id or "",
                 title=title or "",
-                start_time_iso=(s.start_time if s else ""),
+                start_time_iso=snap.start_time or "",
                 meet_link=meet_link or "",
                 attendee_bot_id=bot_id,
                 summary=summary or "",
             )
-            if not ok:
-                print(f"[bot-backend] supabase upsert (finalize) failed for bot_id={bot_id}")
         except Exception as e:
             print(f"[bot-backend] supabase upsert (finalize) error: {e}")
         # Structured RAG ingestion (summary → units → pgvector)
         try:
             from ..rag_pipeline import ingest_summary_units_for_bot
-            if s:
-                ingest_summary_units_for_bot(bot_session=s)
+            await asyncio.to_thread(ingest_summary_units_for_bot, bot_session=s)
         except Exception as e:
             print("Structured RAG ingest failed:", e)
 
 
+    async def summarize_text(self, text: str, title: str = "") -> str:
+        """Groq summary of `text` (local fallback), sharing finalize's concurrency limit."""
+        async with self._summarize_sem:
+            summary = await asyncio.to_thread(self._groq_summarize, text, title)
+        return summary or self._simple_summarize(text)
+
     async def regenerate_summary(self, bot_id: str) -> Optional[str]:
         """Re-run finalization summary generation (useful for manual trigger)."""
         await self._finalize_session(bot_id)
-        async with self._lock:
+        async with self._lk(bot_id):
             s = self.by_bot_id.get(bot_id)
             if not s:
                 return None
             return s.summary_text or ""
 
-    async def add_subscriber(self, bot_id: str) -> Optional[asyncio.Queue]:
-        async with self._lock:
+    async def add_subscriber(self, bot_id: str) -> Optional[SseSubscription]:
+        async with self._lk(bot_id):
             s = self.by_bot_id.get(bot_id)
             if not s:
                 return None
-            q: asyncio.Queue = asyncio.Queue(maxsize=200)
-            s.subscribers.append(q)
-            return q
-
-    async def remove_subscriber(self, bot_id: str, q: asyncio.Queue) -> None:
-        async with self._lock:
-            s = self.by_bot_id.get(bot_id)
-            if not s:
-                return
-            try:
-                s.subscribers.remove(q)
-            except ValueError:
-                pass
+            s.sse_subscribers += 1
+            return SseSubscription(s)
+
+    async def remove_subscriber(self, bot_id: str, sub: SseSubscription) -> None:
+        async with self._lk(bot_id):
+            s = sub.session
+            s.sse_subscribers = max(0, s.sse_subscribers - 1)
+            if not s.sse_subscribers:
+                # Nobody left to read the backlog
+                s.sse_ring.clear()
 
 
 APP_STATE = AppState()
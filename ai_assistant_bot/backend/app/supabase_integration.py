@@ -1,35 +1,97 @@
 from __future__ import annotations
 
+import asyncio
 import os
-from typing import Optional, Dict, Any, List
+import threading
+import time
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Tuple
 
-try:
-    from supabase import create_client, Client
-except Exception:  # pragma: no cover
-    create_client = None
-    Client = object  # type: ignore
+if TYPE_CHECKING:  # pragma: no cover
+    from supabase import Client
 
+# Process-wide client shared by every caller (handlers, worker threads, RAG).
+# The supabase package is imported on first client creation, not at module import.
 _client: Optional[Client] = None
+_client_lock = threading.Lock()
 
+# Short-lived cache for fetch_meetings_cached: (user_id, meet_link, limit) -> (stored_at, result).
+# Dropped per user on every successful meeting write.
+_FETCH_CACHE: Dict[tuple, tuple] = {}
+_FETCH_CACHE_TTL_SEC = 10.0
+_FETCH_CACHE_MAX = 512
 
-def _get_client() -> Optional[Client]:
-    global _client
-    if _client is not None:
-        return _client
-    url = (os.getenv("SUPABASE_URL") or "").strip()
-    key = (os.getenv("SUPABASE_SERVICE_ROLE_KEY") or "").strip()
-    if not url or not key or create_client is None:
-        # Helpful signal in logs if config is missing
-        print("[supabase] client not configured: set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY")
+# Event-loop-only PostgREST client for upsert_meetings_async; created lazily on first use.
+_async_http: Any = None
+# Cleared when the meetings table has no unique index on (user_id, event_id)
+_async_upsert_ok = True
+
+# Meeting rows from queue_upsert_meeting, written in batches by run_write_flusher.
+_WRITE_Q: Optional[asyncio.Queue] = None
+WRITE_BATCH_MAX = 50
+WRITE_BATCH_WINDOW_SEC = float(os.getenv("SUPABASE_WRITE_BATCH_MS", "100") or 0) / 1000.0
+
+
+def _import_create_client():
+    try:
+        from supabase import create_client
+    except Exception:  # pragma: no cover
         return None
+    return create_client
+
+
+def _client_options() -> Any:
+    """PostgREST options: keep-alive pool plus short connect/pool timeouts.
+
+    Best-effort across supabase-py versions; returns None to use library defaults.
+    """
     try:
-        _client = create_client(url, key)
-        return _client
+        import httpx
+        from supabase import ClientOptions
+    except Exception:
+        return None
+    timeout = httpx.Timeout(connect=2.0, read=8.0, write=8.0, pool=2.0)
+    try:
+        return ClientOptions(
+            postgrest_client_timeout=timeout,
+            httpx_client=httpx.Client(
+                timeout=timeout,
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            ),
+        )
+    except TypeError:
+        # Older supabase-py without the httpx_client option
+        try:
+            return ClientOptions(postgrest_client_timeout=timeout)
+        except Exception:
+            return None
     except Exception:
-        print("[supabase] failed to create client")
         return None
 
 
+def get_client() -> Optional[Client]:
+    """Return the shared Supabase client, creating it once (thread-safe)."""
+    global _client
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is not None:
+            return _client
+        url = (os.getenv("SUPABASE_URL") or "").strip()
+        key = (os.getenv("SUPABASE_SERVICE_ROLE_KEY") or "").strip()
+        create_client = _import_create_client() if url and key else None
+        if create_client is None:
+            # Helpful signal in logs if config is missing
+            print("[supabase] client not configured: set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY")
+            return None
+        try:
+            options = _client_options()
+            _client = create_client(url, key, options=options) if options is not None else create_client(url, key)
+            return _client
+        except Exception:
+            print("[supabase] failed to create client")
+            return None
+
+
 def upsert_meeting(
     *,
     user_id: str,
@@ -45,7 +107,7 @@ def upsert_meeting(
     Requires env: SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY.
     Uses unique index on (user_id, meet_link) when meet_link is present.
     """
-    client = _get_client()
+    client = get_client()
     if client is None:
         print("[supabase] upsert skipped: client not available")
         return False
@@ -74,10 +136,12 @@ def upsert_meeting(
         if rows:
             rid = rows[0].get("id")
             client.table("meetings").update({k: v for k, v in payload.items() if v is not None}).eq("id", rid).execute()
+            invalidate_meetings_cache(user_id)
             print(f"[supabase] updated meeting id={rid} user_id={user_id}")
             return True
         else:
             client.table("meetings").insert(payload).execute()
+            invalidate_meetings_cache(user_id)
             print(f"[supabase] inserted meeting user_id={user_id} meet_link={meet_link or '<none>'}")
             return True
     except Exception as e:
@@ -85,6 +149,237 @@ def upsert_meeting(
         return False
 
 
+def _get_async_http() -> Any:
+    """Return the shared httpx.AsyncClient for PostgREST, or None if unavailable."""
+    global _async_http
+    if _async_http is not None and not _async_http.is_closed:
+        return _async_http
+    url = (os.getenv("SUPABASE_URL") or "").strip()
+    key = (os.getenv("SUPABASE_SERVICE_ROLE_KEY") or "").strip()
+    if not url or not key:
+        return None
+    try:
+        import httpx
+    except Exception:
+        return None
+    _async_http = httpx.AsyncClient(
+        base_url=url.rstrip("/"),
+        headers={
+            "apikey": key,
+            "Authorization": f"Bearer {key}",
+            "Content-Type": "application/json",
+            "Prefer": "resolution=merge-duplicates,return=minimal",
+        },
+        timeout=httpx.Timeout(connect=2.0, read=8.0, write=8.0, pool=2.0),
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=10),
+    )
+    return _async_http
+
+
+async def aclose() -> None:
+    """Write any still-queued meeting rows, then close the async PostgREST client (app shutdown)."""
+    global _async_http
+    q = _WRITE_Q
+    if q is not None and not q.empty():
+        rows = []
+        while not q.empty():
+            rows.append(q.get_nowait())
+        try:
+            await upsert_meetings_async(rows)
+        except Exception as e:
+            print(f"[supabase] shutdown flush failed: {e}")
+    http, _async_http = _async_http, None
+    if http is not None:
+        try:
+            await http.aclose()
+        except Exception:
+            pass
+
+
+def _write_queue() -> asyncio.Queue:
+    global _WRITE_Q
+    if _WRITE_Q is None:
+        _WRITE_Q = asyncio.Queue()
+    return _WRITE_Q
+
+
+def queue_upsert_meeting(**row: Any) -> None:
+    """Queue a meeting write (upsert_meeting's keyword arguments) for run_write_flusher."""
+    _write_queue().put_nowait(row)
+
+
+async def run_write_flusher() -> None:
+    """Background writer: drain up to WRITE_BATCH_MAX rows (or wait WRITE_BATCH_WINDOW_SEC) per Supabase call."""
+    q = _write_queue()
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await q.get()]
+        deadline = loop.time() + WRITE_BATCH_WINDOW_SEC
+        while len(batch) < WRITE_BATCH_MAX:
+            if not q.empty():
+                batch.append(q.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(q.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        try:
+            written = await upsert_meetings_async(batch)
+            if written < len(batch):
+                print(f"[supabase] batch upsert wrote {written}/{len(batch)} rows")
+        except Exception as e:
+            print(f"[supabase] batch upsert error: {e}")
+
+
+async def upsert_meetings_async(rows: List[Dict[str, Any]]) -> int:
+    """Non-blocking upsert_meetings for the event loop.
+
+    Rows for the same meeting, (user_id, event_id) as in upsert_meeting, are merged
+    (later non-empty values win) and go out as bulk PostgREST upserts on that key,
+    one request per column set. If that conflict target is missing they run through
+    upsert_meetings in a worker thread instead. Returns the number of meetings written.
+    Recurring events share one meet_link, so it is never the key.
+    """
+    global _async_upsert_ok
+    merged: Dict[tuple, Dict[str, Any]] = {}
+    for r in rows:
+        user_id = r.get("user_id") or ""
+        event_id = r.get("event_id") or ""
+        if not user_id or not event_id:
+            # Schema requires user_id and event_id
+            continue
+        merged.setdefault((user_id, event_id), {}).update({k: v for k, v in r.items() if v})
+    if not merged:
+        return 0
+
+    http = _get_async_http() if _async_upsert_ok else None
+    # column set -> [(merged row, PostgREST payload)]
+    groups: Dict[tuple, List[Tuple[Dict[str, Any], Dict[str, Any]]]] = {}
+    rest: List[Dict[str, Any]] = []
+    for row in merged.values():
+        if http is None:
+            rest.append(row)
+            continue
+        payload = {
+            "user_id": row["user_id"],
+            "event_id": row["event_id"],
+            "title": row.get("title"),
+            "start_time": row.get("start_time_iso"),
+            "meet_link": row.get("meet_link"),
+            "attendee_bot_id": row.get("attendee_bot_id"),
+            "summary": row.get("summary"),
+        }
+        # Omit empty columns so a merge never clears values set by an earlier write;
+        # PostgREST bulk bodies need uniform keys, hence one group per column set.
+        payload = {k: v for k, v in payload.items() if v is not None}
+        groups.setdefault(tuple(sorted(payload)), []).append((row, payload))
+
+    written = 0
+    touched = set()
+    for group in groups.values():
+        if not _async_upsert_ok:
+            rest.extend(row for row, _ in group)
+            continue
+        try:
+            r = await http.post(
+                "/rest/v1/meetings",
+                params={"on_conflict": "user_id,event_id"},
+                json=[payload for _, payload in group],
+            )
+        except Exception as e:
+            print(f"[supabase] batch write failed: {e}")
+            continue
+        if r.status_code < 300:
+            written += len(group)
+            touched.update(row["user_id"] for row, _ in group)
+        elif r.status_code == 400 and "42P10" in r.text:
+            # No unique constraint matches the conflict target; use update-first from now on
+            _async_upsert_ok = False
+            rest.extend(row for row, _ in group)
+        else:
+            print(f"[supabase] batch write failed: HTTP {r.status_code} {r.text[:200]}")
+    for uid in touched:
+        invalidate_meetings_cache(uid)
+    if touched:
+        print(f"[supabase] batch upserted meetings={written}")
+    if rest:
+        written += await asyncio.to_thread(upsert_meetings, rest)
+    return written
+
+
+def upsert_meetings(rows: List[Dict[str, Any]]) -> int:
+    """Batched variant of upsert_meeting.
+
+    Each row takes the same keys as upsert_meeting's keyword arguments. Issues one
+    select to find existing (user_id, event_id) rows, one bulk insert for new rows
+    and one primary-key upsert per payload shape for existing rows.
+    Returns the number of rows written.
+    """
+    client = get_client()
+    if client is None:
+        print("[supabase] batch upsert skipped: client not available")
+        return 0
+    # Last write wins for duplicate (user_id, event_id) within a batch
+    payloads: Dict[tuple, Dict[str, Any]] = {}
+    for r in rows:
+        user_id = r.get("user_id") or ""
+        event_id = r.get("event_id") or ""
+        if not user_id or not event_id:
+            # Schema requires user_id and event_id
+            continue
+        payloads[(user_id, event_id)] = {
+            "user_id": user_id,
+            "event_id": event_id,
+            "title": r.get("title") or None,
+            "start_time": (r.get("start_time_iso") or None),
+            "meet_link": (r.get("meet_link") or None),
+            "attendee_bot_id": r.get("attendee_bot_id") or None,
+            "summary": r.get("summary") or None,
+        }
+    if not payloads:
+        return 0
+    try:
+        user_ids = sorted({k[0] for k in payloads})
+        event_ids = sorted({k[1] for k in payloads})
+        existing = (
+            client.table("meetings")
+            .select("id,user_id,event_id")
+            .in_("user_id", user_ids)
+            .in_("event_id", event_ids)
+            .execute()
+        )
+        ids: Dict[tuple, Any] = {}
+        for row in (getattr(existing, "data", []) or []):
+            ids.setdefault((row.get("user_id"), row.get("event_id")), row.get("id"))
+
+        inserts: List[Dict[str, Any]] = []
+        # Group updates by column set so each PostgREST bulk body is uniform
+        updates: Dict[tuple, List[Dict[str, Any]]] = {}
+        for key, payload in payloads.items():
+            rid = ids.get(key)
+            if rid is None:
+                inserts.append(payload)
+                continue
+            upd = {k: v for k, v in payload.items() if v is not None}
+            upd["id"] = rid
+            updates.setdefault(tuple(sorted(upd)), []).append(upd)
+
+        if inserts:
+            client.table("meetings").insert(inserts).execute()
+        for group in updates.values():
+            client.table("meetings").upsert(group).execute()
+        for uid in user_ids:
+            invalidate_meetings_cache(uid)
+        print(f"[supabase] batch wrote meetings inserted={len(inserts)} updated={len(payloads) - len(inserts)}")
+        return len(payloads)
+    except Exception as e:
+        print(f"[supabase] batch write failed: {e}")
+        return 0
+
+
 def health() -> Dict[str, Any]:
     """Return diagnostic info about Supabase configuration and access.
 
@@ -101,12 +396,13 @@ def health() -> Dict[str, Any]:
         "can_select_meetings": False,
         "error": None,
     }
-    if not has_config or create_client is None:
-        if create_client is None:
-            info["error"] = "supabase client not installed"
+    if not has_config:
+        return info
+    if _import_create_client() is None:
+        info["error"] = "supabase client not installed"
         return info
     try:
-        client = _get_client()
+        client = get_client()
         info["client_ok"] = client is not None
         if client is None:
             return info
@@ -128,7 +424,7 @@ def fetch_meetings(user_id: Optional[str] = None, meet_link: Optional[str] = Non
     Returns { ok, rows, error }.
     """
     res: Dict[str, Any] = {"ok": False, "rows": [], "error": None}
-    client = _get_client()
+    client = get_client()
     if client is None:
         res["error"] = "client not available"
         return res
@@ -146,3 +442,26 @@ def fetch_meetings(user_id: Optional[str] = None, meet_link: Optional[str] = Non
     except Exception as e:
         res["error"] = str(e)
         return res
+
+
+def fetch_meetings_cached(user_id: Optional[str] = None, meet_link: Optional[str] = None, limit: int = 10) -> Dict[str, Any]:
+    """fetch_meetings with a ~10s TTL cache of successful results (for UI polling paths)."""
+    key = (user_id or "", meet_link or "", int(limit))
+    entry = _FETCH_CACHE.get(key)
+    if entry and time.time() - entry[0] < _FETCH_CACHE_TTL_SEC:
+        return entry[1]
+    res = fetch_meetings(user_id=user_id, meet_link=meet_link, limit=limit)
+    if res.get("ok"):
+        if len(_FETCH_CACHE) >= _FETCH_CACHE_MAX:
+            _FETCH_CACHE.pop(next(iter(_FETCH_CACHE)), None)
+        _FETCH_CACHE[key] = (time.time(), res)
+    return res
+
+
+def invalidate_meetings_cache(user_id: Optional[str] = None) -> None:
+    """Drop cached fetch results for a user (all users when user_id is None)."""
+    if user_id is None:
+        _FETCH_CACHE.clear()
+        return
+    for key in [k for k in list(_FETCH_CACHE) if k[0] == user_id]:
+        _FETCH_CACHE.pop(key, None)
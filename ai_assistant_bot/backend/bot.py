@@ -1,16 +1,29 @@
 import asyncio
 import time
-import difflib
-import json
 import os
-import urllib.request
-import urllib.parse
+import random
+import signal
+import weakref
 from urllib.parse import urlparse
 from pathlib import Path
 from dataclasses import dataclass
 from typing import Optional
+import httpx
 from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 
+try:
+    import xxhash
+except Exception:
+    xxhash = None
+
+try:
+    from rapidfuzz.fuzz import ratio as _fuzz_ratio  # 0..100
+except Exception:
+    import difflib
+
+    def _fuzz_ratio(a: str, b: str) -> float:
+        return difflib.SequenceMatcher(None, a, b).ratio() * 100.0
+
 
 def _load_env_files() -> None:
     try:
@@ -33,7 +46,7 @@ API_BASE_URL = os.getenv("API_BASE_URL", "").strip()
 BOT_ID = os.getenv("BOT_ID", "")
 HEADLESS = os.getenv("HEADLESS", "").strip().lower() in {"1", "true", "yes", "y", "on"}
 CHAT_ON_JOIN = os.getenv("CHAT_ON_JOIN", "").strip()
-LAST_SENT = {}  # dedupe finalized segments (key -> last timestamp)
+LAST_SENT: dict[int, float] = {}  # dedupe finalized segments (digest -> last timestamp)
 AUTO_LEAVE_ALONE_SECONDS = float(os.getenv("AUTO_LEAVE_ALONE_SECONDS", "45"))
 AUTO_LEAVE_ENABLED = os.getenv("AUTO_LEAVE_ENABLED", "1").strip().lower() in {"1", "true", "yes", "y", "on"}
 AUTO_LEAVE_MIN_CAPTION_IDLE_SECONDS = float(os.getenv("AUTO_LEAVE_MIN_CAPTION_IDLE_SECONDS", "20"))
@@ -56,9 +69,67 @@ REVISION_WINDOW_SECONDS = 8.0
 FORCE_SPLIT_GAP_SECONDS = 30.0
 MAX_SEGMENT_SECONDS = 20.0
 DEDUP_WINDOW_SECONDS = 2.0
+# Finalized captions are coalesced into one POST of up to this many lines, or
+# whatever arrived within the window after the first one.
+CAPTION_BATCH_MAX = int(os.getenv("CAPTION_BATCH_MAX") or 32)
+CAPTION_BATCH_WINDOW_SECONDS = float(os.getenv("CAPTION_BATCH_MS") or 250) / 1000.0
 
 CAPTIONS_LOG_PATH = Path(__file__).resolve().parent / "data" / "captions.log"
 
+# Meet UI selectors, defined once; the UI helpers get their locators through _loc.
+_CHAT_INPUT_SEL = 'textarea[jsname="YPqjbf"], textarea[aria-label*="Send a message" i]'
+_CHAT_TOGGLE_SEL = 'button[jsname="A5il2e"][data-panel-id="2"]'
+_PANEL_TOGGLES_SEL = 'button[jsname="A5il2e"]'
+# People toggle: one unioned query for the labelled variants; the icon-only match
+# is a fallback used when none of those are present. Meet renders hidden copies of
+# the toolbar buttons, so every alternative carries :visible (else .first may pick
+# a hidden node and the visible wait just times out).
+_PEOPLE_BUTTON_SEL = (
+    'button[aria-label*="Show everyone" i]:visible, '
+    'button[aria-label*="People" i]:visible, '
+    'button[aria-label*="Participants" i]:visible, '
+    'div[role="button"][aria-label*="Show everyone" i]:visible, '
+    '[data-tooltip*="Show everyone" i]:visible, '
+    '[data-tooltip*="People" i]:visible, '
+    '[data-tooltip*="Participants" i]:visible'
+)
+_PEOPLE_ICON_SEL = (
+    'button:has(i.google-symbols:has-text("group")):visible, '
+    'button:has(i.google-symbols:has-text("groups")):visible'
+)
+_PEOPLE_PANEL_SEL = '[role="dialog"]:has-text("People"), [aria-label*="People" i]'
+_EXPANDED_TOGGLE_SEL = 'button[aria-expanded="true"]'
+# Tried in order (priority matters; the plain-CSS ones double as _dom_click fallbacks).
+_GOT_IT_SELECTORS = (
+    'button:has-text("Got it")',
+    'div[role="dialog"] button:has-text("Got it")',
+    'button[data-mdc-dialog-action="ok"]',
+    'div[role="dialog"] [data-mdc-dialog-action="ok"]',
+)
+_LEAVE_SELECTORS = (
+    'button[aria-label*="Leave call" i]',
+    'button[aria-label*="Leave" i]',
+    'button[aria-label*="End call" i]',
+    'button:has(i.google-symbols:has-text("call_end"))',
+)
+
+# Cap for the command long-poll's exponential backoff.
+_POLL_BACKOFF_MAX_SEC = 30.0
+
+# page -> {selector: page.locator(selector).first}; entries go away with the page.
+_LOCATORS: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _loc(page, selector: str):
+    """page.locator(selector).first, built once per page and selector (locators are lazy)."""
+    per_page = _LOCATORS.get(page)
+    if per_page is None:
+        per_page = _LOCATORS[page] = {}
+    loc = per_page.get(selector)
+    if loc is None:
+        loc = per_page[selector] = page.locator(selector).first
+    return loc
+
 
 def _default_api_base() -> str:
     if API_BASE_URL:
@@ -70,24 +141,257 @@ def _default_api_base() -> str:
     return ""
 
 
+# Keep-alive client for backend calls (state updates, command long-poll); see _get_http.
+_http: Optional[httpx.AsyncClient] = None
+
+
+def _get_http() -> httpx.AsyncClient:
+    """Shared backend client, created on first use; the read timeout covers the 25s long-poll."""
+    global _http
+    if _http is None or _http.is_closed:
+        _http = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(max_keepalive_connections=8, max_connections=16),
+            http2=True,
+        )
+    return _http
+
+
+async def _close_http() -> None:
+    global _http
+    client, _http = _http, None
+    if client is not None:
+        try:
+            await client.aclose()
+        except Exception:
+            pass
+
+
 async def _emit_state(state: str) -> None:
     """Best-effort POST to backend to update bot state."""
     if not API_BASE_URL or not BOT_ID:
         return
     try:
         url = f"{_default_api_base()}/bots/{BOT_ID}/state"
-        payload = json.dumps({"state": state}).encode("utf-8")
-        req = urllib.request.Request(url, data=payload, headers={"Content-Type": "application/json"}, method="POST")
-        await asyncio.to_thread(lambda: urllib.request.urlopen(req, timeout=10))  # nosec - internal service
+        await _get_http().post(url, json={"state": state}, timeout=10.0)
     except Exception:
         pass
 
 
+# Cleared when BACKEND_URL has no /batch route (e.g. the standalone Flask server.py).
+_caption_batch_ok = True
+
+# Finalized (payload, log line) pairs awaiting _caption_flusher; see _flush_captions.
+_caption_q: "Optional[asyncio.Queue[tuple[dict, str]]]" = None
+_caption_task: Optional[asyncio.Task] = None
+
+
+def _caption_queue() -> "asyncio.Queue[tuple[dict, str]]":
+    global _caption_q
+    if _caption_q is None:
+        _caption_q = asyncio.Queue()
+    return _caption_q
+
+
+def _start_caption_flusher() -> None:
+    global _caption_task
+    if _caption_task is None or _caption_task.done():
+        _caption_task = asyncio.create_task(_caption_flusher())
+
+
+def _append_caption_log(lines: list[str]) -> None:
+    try:
+        CAPTIONS_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with CAPTIONS_LOG_PATH.open("a", encoding="utf-8") as f:
+            f.write("".join(f"{line}\n" for line in lines))
+    except Exception:
+        pass
+
+
+async def _post_captions(batch: list[tuple[dict, str]]) -> None:
+    """POST a batch of (payload, log line); lines the backend didn't take go to the local log."""
+    global _caption_batch_ok
+    client = _get_http()
+    failed: list[str] = []
+    if _caption_batch_ok:
+        try:
+            resp = await client.post(
+                f"{BACKEND_URL.rstrip('/')}/batch", json=[p for p, _ in batch], timeout=5.0
+            )
+            if resp.status_code in (404, 405):
+                _caption_batch_ok = False
+            elif resp.status_code < 400:
+                return
+            else:
+                failed = [line for _, line in batch]
+        except Exception:
+            failed = [line for _, line in batch]
+    if not _caption_batch_ok:
+        for payload, line in batch:
+            try:
+                resp = await client.post(BACKEND_URL, json=payload, timeout=5.0)
+                if resp.status_code >= 400:
+                    failed.append(line)
+            except Exception:
+                failed.append(line)
+    if failed:
+        await asyncio.to_thread(_append_caption_log, failed)
+
+
+async def _caption_flusher() -> None:
+    """Drain finalized captions: wait for one, gather more for a short window, POST once.
+
+    If cancelled (process shutdown), lines not yet delivered go to the local log.
+    """
+    q = _caption_queue()
+    loop = asyncio.get_running_loop()
+    batch: list[tuple[dict, str]] = []
+    try:
+        while True:
+            batch = [await q.get()]
+            deadline = loop.time() + CAPTION_BATCH_WINDOW_SECONDS
+            while len(batch) < CAPTION_BATCH_MAX:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(q.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await _post_captions(batch)
+            except Exception:
+                pass
+            for _ in batch:
+                q.task_done()
+            batch = []
+    except asyncio.CancelledError:
+        leftovers = [line for _, line in batch]
+        while not q.empty():
+            leftovers.append(q.get_nowait()[1])
+            q.task_done()
+        for _ in batch:
+            q.task_done()
+        if leftovers:
+            _append_caption_log(leftovers)
+        raise
+
+
+async def _flush_captions(timeout: float = 10.0) -> None:
+    """Wait until every caption queued so far has been delivered (or logged locally).
+
+    Called before reporting "ended" so finalize sees the whole transcript.
+    """
+    q = _caption_q
+    if q is None:
+        return
+    if _caption_task is None or _caption_task.done():
+        batch = []
+        while not q.empty():
+            batch.append(q.get_nowait())
+            q.task_done()
+        if batch:
+            await _post_captions(batch)
+        return
+    try:
+        await asyncio.wait_for(q.join(), timeout)
+    except asyncio.TimeoutError:
+        print(f"[WARN] {q.qsize()} caption(s) still queued after {timeout:.0f}s flush")
+
+
+async def _close_captions() -> None:
+    """Flush queued captions, then stop the flusher (which logs anything left)."""
+    global _caption_task
+    try:
+        await _flush_captions()
+    finally:
+        task, _caption_task = _caption_task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+# Installed as an init script before navigation. One MutationObserver keeps the
+# participant badge (window.__meetReady.participantCount / aloneSinceMs) current;
+# that is a single attribute read per mutation batch. The chat flags (chatOpen,
+# sendEnabled) need selector queries and a layout read, so they are only computed
+# while window.__waitFor(flag, timeoutMs) has a pending waiter; it resolves true the
+# moment the flag turns truthy (false on timeout), so Python waits on a single
+# evaluate instead of polling locators over CDP.
+_MEET_READY_JS = """
+(() => {
+    if (window.__meetReady) return;
+    const ready = window.__meetReady = {
+        chatOpen: false, sendEnabled: false, participantCount: null,
+        // performance.now() when the participant badge last became 1; null otherwise
+        aloneSinceMs: null,
+    };
+    let waiters = [];
+    let poll = null;
+    const readBadge = () => {
+        const badge = document.querySelector('[data-avatar-count]');
+        const n = badge ? parseInt(badge.getAttribute('data-avatar-count'), 10) : NaN;
+        ready.participantCount = Number.isFinite(n) ? n : null;
+        if (ready.participantCount !== 1) ready.aloneSinceMs = null;
+        else if (ready.aloneSinceMs === null) ready.aloneSinceMs = performance.now();
+    };
+    const readChat = () => {
+        const chat = document.querySelector('#ME4pNd')
+            || document.querySelector('textarea[jsname="YPqjbf"], textarea[aria-label*="Send a message" i]');
+        ready.chatOpen = !!chat && chat.getClientRects().length > 0;
+        ready.sendEnabled = !!document.querySelector(
+            'button[jsname="SoqoBf"]:not([disabled]), [role="button"][jsname="SoqoBf"]:not([disabled]), ' +
+            'button[aria-label*="Send a message" i]:not([disabled])'
+        );
+    };
+    const settle = () => {
+        if (waiters.length) {
+            readChat();
+            waiters = waiters.filter((w) => !w());
+        }
+        if (!waiters.length && poll !== null) {
+            clearInterval(poll);
+            poll = null;
+        }
+    };
+    window.__waitFor = (flag, timeoutMs) => new Promise((resolve) => {
+        readChat();
+        if (ready[flag]) return resolve(true);
+        let timer = null;
+        const w = () => {
+            if (!ready[flag]) return false;
+            clearTimeout(timer);
+            resolve(true);
+            return true;
+        };
+        waiters.push(w);
+        // Visibility can flip through class/style changes the observer ignores;
+        // re-check on a short timer, only while someone is waiting.
+        if (poll === null) poll = setInterval(settle, 100);
+        timer = setTimeout(() => {
+            waiters = waiters.filter((x) => x !== w);
+            settle();
+            resolve(false);
+        }, timeoutMs);
+    });
+    new MutationObserver(() => {
+        readBadge();
+        settle();
+    }).observe(document.documentElement, {
+        subtree: true, childList: true, attributes: true,
+        attributeFilter: ['disabled', 'aria-expanded', 'data-avatar-count', 'aria-label'],
+    });
+    readBadge();
+})();
+"""
+
+
 async def _open_chat_panel(page) -> bool:
     # If textbox exists → already open
-    textbox = page.locator(
-        'textarea[jsname="YPqjbf"], textarea[aria-label*="Send a message" i]'
-    ).first
+    textbox = _loc(page, _CHAT_INPUT_SEL)
 
     if await textbox.count() > 0:
         return True
@@ -95,13 +399,14 @@ async def _open_chat_panel(page) -> bool:
     # Force toolbar to stay visible
     vp = page.viewport_size or {"width": 1280, "height": 720}
 
-    # Move mouse to extreme bottom center
-    await page.mouse.move(vp["width"] // 2, vp["height"] - 2)
-    await asyncio.sleep(0.3)
+    toggle = _loc(page, _CHAT_TOGGLE_SEL)
 
-    toggle = page.locator(
-        'button[jsname="A5il2e"][data-panel-id="2"]'
-    ).first
+    # Move mouse to extreme bottom center, then wait for the toolbar's chat toggle
+    await page.mouse.move(vp["width"] // 2, vp["height"] - 2)
+    try:
+        await toggle.wait_for(state="attached", timeout=1000)
+    except PlaywrightTimeoutError:
+        pass
 
     if await toggle.count() == 0:
         print("[WARN] Chat toggle not found")
@@ -109,12 +414,12 @@ async def _open_chat_panel(page) -> bool:
 
     try:
         await toggle.click(force=True)
-        await asyncio.sleep(0.8)
     except Exception as e:
         print("[WARN] Toggle click failed:", e)
         return False
 
-    # Confirm panel opened
+    # Confirm panel opened (pushed by the in-page observer as soon as it renders)
+    await _wait_ready(page, "chatOpen", 3000)
     if await textbox.count() > 0:
         return True
 
@@ -125,26 +430,13 @@ async def _open_chat_panel(page) -> bool:
 async def _open_people_panel(page) -> bool:
     """Open the People/Participants panel in Meet."""
     await _wake_meet_controls(page)
-    selectors = [
-        'button[aria-label*="Show everyone" i]',
-        'button[aria-label*="People" i]',
-        'button[aria-label*="Participants" i]',
-        'div[role="button"][aria-label*="Show everyone" i]',
-        '[data-tooltip*="Show everyone" i]',
-        '[data-tooltip*="People" i]',
-        '[data-tooltip*="Participants" i]',
-        'button:has(i.google-symbols:has-text("group"))',
-        'button:has(i.google-symbols:has-text("groups"))',
-    ]
-    for sel in selectors:
+    for sel, wait_ms in ((_PEOPLE_BUTTON_SEL, 3000), (_PEOPLE_ICON_SEL, 1500)):
         try:
-            loc = page.locator(sel).first
-            if await loc.count() == 0:
-                continue
+            loc = _loc(page, sel)
             try:
-                await loc.wait_for(state="visible", timeout=1500)
+                await loc.wait_for(state="visible", timeout=wait_ms)
             except Exception:
-                pass
+                continue
             try:
                 await loc.scroll_into_view_if_needed()
             except Exception:
@@ -159,15 +451,13 @@ async def _open_people_panel(page) -> bool:
             await asyncio.sleep(0.4)
             # Try to detect panel visible via common container hints
             try:
-                panel = page.locator('[role="dialog"]:has-text("People"), [aria-label*="People" i]').first
-                if await panel.count() > 0:
+                if await _loc(page, _PEOPLE_PANEL_SEL).count() > 0:
                     return True
             except Exception:
                 pass
             # If toggle shows expanded, treat as open
             try:
-                toggle = page.locator('button[aria-expanded="true"]').first
-                if await toggle.count() > 0:
+                if await _loc(page, _EXPANDED_TOGGLE_SEL).count() > 0:
                     return True
             except Exception:
                 pass
@@ -179,8 +469,12 @@ async def _open_people_panel(page) -> bool:
 async def _inject_user_manager(page) -> None:
     """Inject a lightweight userManager into the Meet page to track participants.
 
-    This mimics the idea of a JS payload that keeps a current users map updated by
-    scanning the People panel DOM periodically.
+    This mimics the idea of a JS payload that keeps a current users map updated from
+    the People panel DOM. Rescans are driven by a MutationObserver scoped to the
+    People panel's participant list and collapsed to one per microtask. A page-wide
+    childList watch re-binds that observer when the list is replaced or when
+    participant nodes appear outside it (panel opened or re-rendered). Until a list
+    is found, the whole document is scanned at most every 1.5 s, as before.
     """
     try:
         script = """
@@ -194,9 +488,22 @@ async def _inject_user_manager(page) -> None:
                 getUserByDeviceId(id) { return null; }
             };
 
+            const MEMBER_SEL = '[data-member-id], [role="listitem"]';
+            const PEOPLE_LIST_SEL =
+                '[role="list"][aria-label*="Participant" i], [role="list"][aria-label*="People" i], ' +
+                '[role="dialog"][aria-label*="People" i] [role="list"]';
+            // Nodes that mean the People list exists (generic list items do not).
+            const PEOPLE_HINT_SEL = '[data-member-id], ' + PEOPLE_LIST_SEL;
+            const DOC_SCAN_MS = 1500;
+            let root = null;  // participant list currently observed
+            let dirty = true;
+            let queued = false;
+            let rebindWanted = true;
+            let lastDocScan = -Infinity;
+
             function refreshFromDom() {
                 try {
-                    const items = Array.from(document.querySelectorAll('[data-member-id], [role="listitem"]'));
+                    const items = Array.from((root || document).querySelectorAll(MEMBER_SEL));
                     const curr = new Map();
                     for (const el of items) {
                         let fullName = '';
@@ -213,9 +520,69 @@ async def _inject_user_manager(page) -> None:
                 } catch (e) {}
             }
 
+            const scoped = new MutationObserver(() => { dirty = true; schedule(); });
+
+            function findRoot() {
+                const list = document.querySelector(PEOPLE_LIST_SEL);
+                if (list) return list;
+                const item = document.querySelector('[data-member-id]');
+                return item ? (item.closest('[role="list"]') || item.parentElement) : null;
+            }
+
+            function rebind() {
+                rebindWanted = false;
+                const next = findRoot();
+                if (next === root) return;
+                scoped.disconnect();
+                root = next;
+                if (root) {
+                    scoped.observe(root, {
+                        subtree: true, childList: true,
+                        attributes: true, attributeFilter: ['aria-label', 'data-member-id'],
+                    });
+                }
+                dirty = true;
+            }
+
+            function schedule() {
+                if (queued) return;
+                queued = true;
+                queueMicrotask(() => {
+                    queued = false;
+                    if (rebindWanted || !root || !root.isConnected) rebind();
+                    if (!root) {
+                        // No participant list to scope to: throttled whole-document scan.
+                        const now = performance.now();
+                        if (now - lastDocScan >= DOC_SCAN_MS) {
+                            lastDocScan = now;
+                            dirty = true;
+                        }
+                    }
+                    if (dirty) {
+                        dirty = false;
+                        refreshFromDom();
+                    }
+                });
+            }
+
+            // Page-wide childList watch only to notice the People list appearing or being
+            // replaced; while the bound list is attached it only looks at added nodes
+            // outside it for participant entries.
+            new MutationObserver((records) => {
+                if (!root || !root.isConnected) return schedule();
+                for (const rec of records) {
+                    for (const n of rec.addedNodes) {
+                        if (n.nodeType !== 1 || root.contains(n)) continue;
+                        if (n.matches(PEOPLE_HINT_SEL) || n.querySelector(PEOPLE_HINT_SEL)) {
+                            rebindWanted = true;
+                            return schedule();
+                        }
+                    }
+                }
+            }).observe(document.documentElement, { childList: true, subtree: true });
+
             window.userManager = manager;
-            refreshFromDom();
-            setInterval(refreshFromDom, 1500);
+            schedule();
         })();
         """
         await page.add_init_script(script)
@@ -247,30 +614,6 @@ async def _get_current_users_count(page) -> Optional[int]:
         return None
 
 
-async def _get_dom_contributors_count(page) -> Optional[int]:
-    try:
-        val = await page.evaluate(
-            """
-            () => {
-                const el = document.querySelector('[data-avatar-count]');
-                if (!el) return null;
-
-                const count = el.getAttribute('data-avatar-count');
-                return count ? parseInt(count, 10) : null;
-            }
-            """
-        )
-
-        if val is None:
-            return None
-
-        return int(val)
-
-    except Exception:
-        return None
-
-
-
 async def _debug_chat_dom(page) -> None:
     try:
         info = await page.evaluate(
@@ -304,25 +647,95 @@ async def _debug_chat_dom(page) -> None:
         print(f"[CHAT DEBUG] failed: {e}")
 
 
+async def _wait_ready(page, flag: str, timeout_ms: int) -> bool:
+    """Resolve as soon as window.__meetReady[flag] is truthy (see _MEET_READY_JS); False on timeout."""
+    try:
+        return bool(
+            await page.evaluate(
+                "([f, t]) => window.__waitFor ? window.__waitFor(f, t) : false", [flag, timeout_ms]
+            )
+        )
+    except Exception:
+        return False
+
+
+async def _wait_textbox_cleared(page, textbox, timeout: float) -> bool:
+    """Wait until the chat textbox is empty (Meet clears it once a message is sent)."""
+    try:
+        handle = await textbox.element_handle(timeout=timeout)
+        await page.wait_for_function(
+            "(el) => ((el.tagName === 'TEXTAREA' ? el.value : el.textContent) || '').trim() === ''",
+            arg=handle,
+            timeout=timeout,
+        )
+        return True
+    except Exception:
+        return False
+
+
+# Chat textbox candidates, most specific first (some Meet builds use a contenteditable textbox).
+_CHAT_TEXTBOX_SELECTORS = (
+    'textarea[jsname="YPqjbf"]',
+    'textarea[aria-label="Send a message" i]',
+    'textarea[placeholder*="Send a message" i]',
+    '[contenteditable="true"][role="textbox"]',
+    'div[contenteditable="true"]',
+    'textarea',
+)
+# Send button candidates (jsname=SoqoBf first).
+_SEND_BTN_SELECTORS = (
+    'button[jsname="SoqoBf"][aria-label*="Send a message" i]',
+    '[role="button"][jsname="SoqoBf"][aria-label*="Send a message" i]',
+    'button[aria-label*="Send a message" i]',
+    '[role="button"][aria-label*="Send a message" i]',
+)
+
+_READ_CHAT_STATE_JS = """
+([tbSels, sendSels, requireVisible]) => {
+    const vis = (el) => !!el && el.getClientRects().length > 0 && getComputedStyle(el).visibility !== 'hidden';
+    const open = vis(document.querySelector('#ME4pNd'))
+        || vis(document.querySelector('textarea[jsname="YPqjbf"], textarea[aria-label*="Send a message" i]'));
+    const out = { open, textboxSel: null, sendSel: null, sendDisabled: null };
+    for (const sel of tbSels) {
+        const el = document.querySelector(sel);
+        if (!el || (requireVisible && !vis(el))) continue;
+        out.textboxSel = sel;
+        break;
+    }
+    for (const sel of sendSels) {
+        const el = document.querySelector(sel);
+        if (!vis(el)) continue;
+        out.sendSel = sel;
+        out.sendDisabled = el.hasAttribute('disabled');
+        break;
+    }
+    return out;
+}
+"""
+
+
+async def _read_chat_state(page) -> dict:
+    """Every chat probe _send_chat_message needs, in one page.evaluate round trip.
+
+    Keys: open, textboxSel (first usable textbox), sendSel/sendDisabled (first visible
+    send button); selectors are None when absent.
+    """
+    try:
+        return await page.evaluate(
+            _READ_CHAT_STATE_JS, [list(_CHAT_TEXTBOX_SELECTORS), list(_SEND_BTN_SELECTORS), not HEADLESS]
+        )
+    except Exception:
+        return {"open": False, "textboxSel": None, "sendSel": None}
+
+
 async def _send_chat_message(page, message: str) -> bool:
     msg = (message or "").strip()
     if not msg:
         return False
-    
+
     # If chat is already open, don't toggle it; otherwise open it.
-    async def _is_chat_open_local() -> bool:
-        try:
-            panel_loc = page.locator('#ME4pNd, [id="ME4pNd"]').first
-            input_loc = page.locator('textarea[jsname="YPqjbf"], textarea[aria-label*="Send a message" i]').first
-            if await panel_loc.count() > 0 and await panel_loc.first.is_visible():
-                return True
-            if await input_loc.count() > 0 and await input_loc.first.is_visible():
-                return True
-        except Exception:
-            pass
-        return False
-    
-    if not await _is_chat_open_local():
+    state = await _read_chat_state(page)
+    if not state.get("open"):
         if not await _open_chat_panel(page):
             # One more quick keyboard fallback try directly from sender
             try:
@@ -330,60 +743,21 @@ async def _send_chat_message(page, message: str) -> bool:
                     await page.keyboard.down(m1); await page.keyboard.down(m2)
                     await page.keyboard.press(key)
                     await page.keyboard.up(m2); await page.keyboard.up(m1)
-                    for _ in range(10):
-                        if await _is_chat_open_local():
-                            break
-                        await asyncio.sleep(0.1)
-                    if await _is_chat_open_local():
+                    if await _wait_ready(page, "chatOpen", 1000):
                         break
             except Exception:
                 pass
-        if not await _is_chat_open_local():
+        state = await _read_chat_state(page)
+        if not state.get("open"):
             print("[WARN] Chat panel not opened")
             await _debug_chat_dom(page)
             return False
 
-
-    # Prefer exact Meet chat textarea you pasted. Some Meet builds use a contenteditable textbox.
-    textbox_selectors = [
-        'textarea[jsname="YPqjbf"]',
-        'textarea[aria-label="Send a message" i]',
-        'textarea[placeholder*="Send a message" i]',
-        '[contenteditable="true"][role="textbox"]',
-        'div[contenteditable="true"]',
-        'textarea',
-    ]
-
-    textbox = None
-    for sel in textbox_selectors:
-        try:
-            loc = page.locator(sel).first
-            if await loc.count() == 0:
-                continue
-            if not HEADLESS:
-                if not await loc.is_visible():
-                    continue
-            textbox = loc
-            break
-        except Exception:
-            continue
-
-    if textbox is None:
+    if not state.get("textboxSel"):
         print("[WARN] Chat textbox not found")
         await _debug_chat_dom(page)
         return False
-
-    async def _textbox_value() -> str:
-        try:
-            tag = (await textbox.evaluate("(el) => el.tagName")) or ""
-            if str(tag).upper() == "TEXTAREA":
-                return (await textbox.input_value()) or ""
-        except Exception:
-            pass
-        try:
-            return (await textbox.evaluate("(el) => (el.textContent || '')")) or ""
-        except Exception:
-            return ""
+    textbox = _loc(page, state["textboxSel"])
 
     try:
         await textbox.click(force=True)
@@ -394,7 +768,8 @@ async def _send_chat_message(page, message: str) -> bool:
         except Exception:
             pass
         await page.keyboard.type(msg, delay=15)
-        await asyncio.sleep(0.25)
+        # Meet enables its send button once it has processed the input events
+        await _wait_ready(page, "sendEnabled", 1000)
     except Exception:
         print("[WARN] Failed to type into chat textbox")
         await _debug_chat_dom(page)
@@ -404,56 +779,28 @@ async def _send_chat_message(page, message: str) -> bool:
     # In Meet chat this usually sends (Shift+Enter is newline).
     try:
         await page.keyboard.press("Enter")
-        await asyncio.sleep(0.4)
-        after = (await _textbox_value()).strip()
-        if not after:
+        if await _wait_textbox_cleared(page, textbox, timeout=800):
             print(f"[OK] Sent chat message via Enter ({len(msg)} chars)")
             return True
     except Exception:
         pass
 
     # Click the send button you pasted (jsname=SoqoBf) once it becomes enabled.
-    send_selectors = [
-        'button[jsname="SoqoBf"][aria-label*="Send a message" i]',
-        '[role="button"][jsname="SoqoBf"][aria-label*="Send a message" i]',
-        'button[aria-label*="Send a message" i]',
-        '[role="button"][aria-label*="Send a message" i]',
-    ]
-
-    for sel in send_selectors:
+    state = await _read_chat_state(page)
+    if state.get("sendSel"):
         try:
-            btn = page.locator(sel).first
-            if await btn.count() == 0:
-                continue
-            # Wait briefly for disabled="" to be removed.
-            try:
-                await btn.wait_for(state="visible", timeout=2500)
-            except Exception:
-                continue
-
-            # Poll until enabled (Meet initially renders disabled until input event).
-            enabled = False
-            for _ in range(30):
-                disabled = await btn.get_attribute("disabled")
-                if disabled is None:
-                    enabled = True
-                    break
-                await asyncio.sleep(0.1)
-
-            if not enabled:
-                continue
-
-            await btn.click(force=True)
-            await asyncio.sleep(0.4)
-            after = (await _textbox_value()).strip()
-            if not after:
-                print(f"[OK] Sent chat message via send button ({len(msg)} chars)")
+            btn = _loc(page, state["sendSel"])
+            # Meet initially renders it disabled until the input event lands.
+            if not state.get("sendDisabled") or await _wait_ready(page, "sendEnabled", 3000):
+                await btn.click(force=True)
+                if await _wait_textbox_cleared(page, textbox, timeout=800):
+                    print(f"[OK] Sent chat message via send button ({len(msg)} chars)")
+                    return True
+                # Sometimes the textbox doesn't clear even when sent; accept best-effort.
+                print(f"[OK] Clicked send button ({len(msg)} chars)")
                 return True
-            # Sometimes the textbox doesn't clear even when sent; accept best-effort.
-            print(f"[OK] Clicked send button ({len(msg)} chars)")
-            return True
         except Exception:
-            continue
+            pass
 
     print("[WARN] Send button not clickable")
     await _debug_chat_dom(page)
@@ -476,9 +823,7 @@ async def _send_chat_message(page, message: str) -> bool:
             """,
             msg,
         )
-        await asyncio.sleep(0.6)
-        after = (await _textbox_value()).strip()
-        if not after:
+        if await _wait_textbox_cleared(page, textbox, timeout=1000):
             print(f"[OK] Sent chat message via DOM fallback ({len(msg)} chars)")
             return True
         else:
@@ -497,38 +842,33 @@ async def _command_poll_loop(page) -> None:
         return
 
     url = f"{base}/bots/{BOT_ID}/commands/next"
+    params = {"timeout": 25}
+    backoff = 0.0
     while True:
+        if backoff:
+            # Exponential backoff with jitter so a down backend isn't hammered.
+            await asyncio.sleep(backoff + random.random())
+        try:
+            resp = await _get_http().get(url, params=params)
+        except Exception:
+            backoff = min(backoff * 2 or 1.0, _POLL_BACKOFF_MAX_SEC)
+            continue
+        if resp.status_code != 200:
+            backoff = min(backoff * 2 or 1.0, _POLL_BACKOFF_MAX_SEC)
+            continue
+        backoff = 0.0
+        try:
+            data = resp.json() if resp.content else {}
+        except Exception:
+            data = {}
+        cmd = (data or {}).get("command")
+        if not cmd:
+            continue
         try:
-            def _fetch() -> tuple[int, str]:
-                full_url = url
-                try:
-                    full_url = f"{url}?{urllib.parse.urlencode({'timeout': 25})}"
-                except Exception:
-                    pass
-                req = urllib.request.Request(full_url, method="GET")
-                try:
-                    with urllib.request.urlopen(req, timeout=30) as resp:  # nosec - internal service
-                        status = getattr(resp, "status", None) or resp.getcode()
-                        body = resp.read().decode("utf-8", errors="replace")
-                        return int(status), body
-                except Exception:
-                    return 0, ""
-
-            status_code, body = await asyncio.to_thread(_fetch)
-            if status_code != 200:
-                await asyncio.sleep(1)
-                continue
-            try:
-                data = json.loads(body) if body else {}
-            except Exception:
-                data = {}
-            cmd = (data or {}).get("command")
-            if not cmd:
-                continue
             if cmd.get("type") == "chat":
                 await _send_chat_message(page, cmd.get("text") or "")
         except Exception:
-            await asyncio.sleep(1)
+            pass
 
 
 async def _is_alone(page) -> bool:
@@ -564,15 +904,9 @@ async def _is_alone(page) -> bool:
 
 async def _leave_call(page) -> bool:
     """Click the leave/hang up button and close the page."""
-    selectors = [
-        'button[aria-label*="Leave call" i]',
-        'button[aria-label*="Leave" i]',
-        'button[aria-label*="End call" i]',
-        'button:has(i.google-symbols:has-text("call_end"))',
-    ]
-    for sel in selectors:
+    for sel in _LEAVE_SELECTORS:
         try:
-            btn = page.locator(sel).first
+            btn = _loc(page, sel)
             if await btn.count() == 0:
                 continue
             await btn.scroll_into_view_if_needed()
@@ -589,40 +923,45 @@ async def _leave_call(page) -> bool:
 
 
 async def _monitor_alone_and_leave(page) -> None:
-    alone_since = None
-
+    # The in-page observer (_MEET_READY_JS) stamps aloneSinceMs when the avatar badge
+    # drops to 1; this single wait polls that in the page, with no CDP traffic, and
+    # returns once the bot has been alone for AUTO_LEAVE_ALONE_SECONDS.
+    threshold_ms = AUTO_LEAVE_ALONE_SECONDS * 1000
     while True:
         try:
-            # Use the data-avatar-count attribute
-            count = await _get_dom_contributors_count(page)
-            print("[LEAVE CHECK] avatar count =", count)
-
-            if count == 1:
-                if alone_since is None:
-                    alone_since = time.time()
-                elif time.time() - alone_since >= AUTO_LEAVE_ALONE_SECONDS:
-                    print("[INFO] Alone detected (count=1). Leaving meeting.")
-
-                    try:
-                        await _emit_state("ended")
-                    except Exception:
-                        pass
-
-                    await _leave_call(page)
-                    await asyncio.sleep(1)
-
-                    try:
-                        await page.context.close()
-                    except Exception:
-                        pass
-                    return
-            else:
-                alone_since = None
-
+            await page.wait_for_function(
+                """(ms) => {
+                    const r = window.__meetReady;
+                    return !!r && r.aloneSinceMs !== null && performance.now() - r.aloneSinceMs >= ms;
+                }""",
+                arg=threshold_ms,
+                polling=1000,
+                timeout=0,
+            )
         except Exception as e:
+            if page.is_closed():
+                return
+            # e.g. the page navigated and destroyed the execution context
             print("Leave monitor error:", e)
+            await asyncio.sleep(5)
+            continue
 
-        await asyncio.sleep(5)
+        print("[INFO] Alone detected (count=1). Leaving meeting.")
+
+        try:
+            await _flush_captions()
+            await _emit_state("ended")
+        except Exception:
+            pass
+
+        await _leave_call(page)
+        await asyncio.sleep(1)
+
+        try:
+            await page.context.close()
+        except Exception:
+            pass
+        return
 
 
 
@@ -631,30 +970,16 @@ async def _wake_meet_controls(page) -> None:
     try:
         vp = page.viewport_size or {"width": 1280, "height": 720}
         await page.mouse.move(vp["width"] // 2, vp["height"] // 2)
-        await asyncio.sleep(0.05)
         await page.mouse.move(vp["width"] // 2, max(5, vp["height"] - 12))
-        await asyncio.sleep(0.1)
+        # Returns as soon as the control bar's panel toggles are shown
+        await _loc(page, _PANEL_TOGGLES_SEL).wait_for(state="visible", timeout=500)
     except Exception:
         pass
 
     # Close transient popovers/menus that can block clicks.
     try:
         # Do NOT press Escape if the chat panel appears to be open; Escape would close it.
-        chat_panel = page.locator('#ME4pNd, [id="ME4pNd"]').first
-        chat_input = page.locator('textarea[jsname="YPqjbf"], textarea[aria-label*="Send a message" i]').first
-        chat_open = False
-        try:
-            if await chat_panel.count() > 0 and await chat_panel.first.is_visible():
-                chat_open = True
-        except Exception:
-            pass
-        if not chat_open:
-            try:
-                if await chat_input.count() > 0 and await chat_input.first.is_visible():
-                    chat_open = True
-            except Exception:
-                pass
-        if not chat_open:
+        if not (await _read_chat_state(page)).get("open"):
             await page.keyboard.press("Escape")
     except Exception:
         pass
@@ -708,15 +1033,9 @@ async def _dismiss_got_it_popup(page) -> bool:
     """
     await _wake_meet_controls(page)
     # Try common selectors and role-based queries first
-    selectors = [
-        'button:has-text("Got it")',
-        'div[role="dialog"] button:has-text("Got it")',
-        'button[data-mdc-dialog-action="ok"]',
-        'div[role="dialog"] [data-mdc-dialog-action="ok"]',
-    ]
-    for sel in selectors:
+    for sel in _GOT_IT_SELECTORS:
         try:
-            loc = page.locator(sel).first
+            loc = _loc(page, sel)
             if await loc.count() == 0:
                 continue
             try:
@@ -731,7 +1050,10 @@ async def _dismiss_got_it_popup(page) -> bool:
                 except Exception:
                     # DOM fallback
                     await _dom_click(page, sel)
-            await asyncio.sleep(0.2)
+            try:
+                await loc.wait_for(state="detached", timeout=1000)
+            except Exception:
+                pass
             print('[UI] Dismissed "Got it" popup')
             return True
         except Exception:
@@ -798,6 +1120,13 @@ class Segment:
     updated_at: float
 
 
+def _caption_digest(speaker: str, text: str) -> int:
+    """64-bit digest of (speaker, text) so the dedupe map doesn't hold caption strings."""
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(f"{speaker}\x00{text}")
+    return hash((speaker, text))
+
+
 class CaptionSegmenter:
     """Attendee-like segmenter.
 
@@ -871,7 +1200,7 @@ class CaptionSegmenter:
             return True
 
         try:
-            return difflib.SequenceMatcher(None, p, c).ratio() >= 0.80
+            return _fuzz_ratio(p, c) >= 80.0
         except Exception:
             return False
 
@@ -1232,6 +1561,7 @@ async def _monitor_meeting_end(page) -> None:
                     if await page.locator(f'text="{t}"').count() > 0:
                         print(f"[INFO] End-of-meeting detected: {t}")
                         try:
+                            await _flush_captions()
                             await _emit_state("ended")
                         except Exception:
                             pass
@@ -1344,8 +1674,8 @@ async def _attach_caption_observer(page, meet_link: str):
             return
 
         now = time.time()
-        dedupe_key = f"{spk}|{txt}"
-        if dedupe_key in LAST_SENT and now - LAST_SENT.get(dedupe_key, 0) < DEDUP_WINDOW_SECONDS:
+        dedupe_key = _caption_digest(spk, txt)
+        if now - LAST_SENT.get(dedupe_key, 0.0) < DEDUP_WINDOW_SECONDS:
             return
         LAST_SENT[dedupe_key] = now
         if len(LAST_SENT) > 5000:
@@ -1359,33 +1689,17 @@ async def _attach_caption_observer(page, meet_link: str):
         line = f"[{time.strftime('%H:%M:%S')}] {prefix}{txt}"
         print(line)
 
-        # Prefer backend write; fallback to local file if backend unavailable.
-        try:
-            payload = {
-                "text": txt,
-                "speaker": spk,
-                "ts": ts,
-                "meet_link": meet_link,
-                "meeting_id": meeting_id,
-                "bot_id": BOT_ID,
-            }
-            req = urllib.request.Request(
-                BACKEND_URL,
-                data=json.dumps(payload).encode("utf-8"),
-                headers={"Content-Type": "application/json"},
-                method="POST",
-            )
-            with urllib.request.urlopen(req, timeout=5) as resp:  # nosec - internal service
-                status_code = getattr(resp, "status", None) or resp.getcode()
-            if int(status_code) >= 400:
-                raise RuntimeError(f"backend status {status_code}")
-        except Exception:
-            try:
-                CAPTIONS_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
-                with CAPTIONS_LOG_PATH.open("a", encoding="utf-8") as f:
-                    f.write(line + "\n")
-            except Exception:
-                pass
+        # Prefer backend write (batched by _caption_flusher); it falls back to the
+        # local file if the backend is unavailable.
+        payload = {
+            "text": txt,
+            "speaker": spk,
+            "ts": ts,
+            "meet_link": meet_link,
+            "meeting_id": meeting_id,
+            "bot_id": BOT_ID,
+        }
+        _caption_queue().put_nowait((payload, line))
 
     # Delta helper: longest common prefix (case-insensitive, collapses whitespace)
     def _prefix_len(a: str, b: str) -> int:
@@ -1452,6 +1766,7 @@ async def _attach_caption_observer(page, meet_link: str):
             if idle > 60:
                 print(f"[CaptionBot] No captions received for {int(idle)}s")
     asyncio.create_task(_watchdog())
+    _start_caption_flusher()
     asyncio.create_task(_emit_periodic())
 
     def _log_console(msg):
@@ -1598,6 +1913,12 @@ async def _attach_caption_observer(page, meet_link: str):
     """)
 
 async def main():
+    # The backend stops bots with terminate(); turn SIGTERM into cancellation so the
+    # finally below still delivers (or logs) queued captions. Not available on Windows.
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except (NotImplementedError, RuntimeError, AttributeError):
+        pass
     async with async_playwright() as p:
         # Headless mode can be enabled via env: HEADLESS=1
         browser = await p.chromium.launch(headless=HEADLESS)
@@ -1611,6 +1932,8 @@ async def main():
             context = await browser.new_context()
         
         page = await context.new_page()
+        # Readiness flags (chat open, send enabled, participant count) pushed from the page
+        await page.add_init_script(_MEET_READY_JS)
         await page.goto(MEET_LINK, wait_until="domcontentloaded")
         await page.wait_for_load_state("networkidle")
         print("Navigated to Google Meet...")
@@ -1775,6 +2098,12 @@ async def main():
         asyncio.create_task(_monitor_alone_and_leave(page))
         # Also detect explicit end-of-meeting screens and finalize.
         asyncio.create_task(_monitor_meeting_end(page))
-        await asyncio.sleep(3600)  # Keep browser open
+        try:
+            await asyncio.sleep(3600)  # Keep browser open
+        finally:
+            try:
+                await _close_captions()
+            finally:
+                await _close_http()
 
 asyncio.run(main())
\ No newline at end of file